@@ -0,0 +1,64 @@
+"""Compare JSON serialization of a synthetic themes.json using the stdlib
+and orjson JSON providers.
+
+Usage:
+    python benchmarks/json_provider_benchmark.py [--themes N] [--layers M]
+        [--depth D] [--repeat R]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from json_provider import OrjsonProvider, orjson  # noqa: E402
+from synthetic_themes import build_themes  # noqa: E402
+
+
+def benchmark_provider(provider_class, data, repeat):
+    """Return min duration in seconds and response size for serializing
+    data as JSON response.
+
+    :param class provider_class: JSON provider class
+    :param obj data: JSON data
+    :param int repeat: Number of repetitions
+    """
+    app = Flask(__name__)
+    app.json = provider_class(app)
+    with app.app_context():
+        body = app.json.response(data).get_data()
+        durations = timeit.repeat(
+            lambda: app.json.response(data).get_data(), number=1, repeat=repeat
+        )
+    return min(durations), body
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--themes', type=int, default=50, help="Number of themes")
+    parser.add_argument('--layers', type=int, default=200, help="Data layers per theme")
+    parser.add_argument('--depth', type=int, default=4, help="Group nesting depth")
+    parser.add_argument('--repeat', type=int, default=20, help="Repetitions")
+    args = parser.parse_args()
+
+    data = build_themes(args.themes, args.layers, args.depth)
+
+    providers = [('stdlib', DefaultJSONProvider)]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider))
+    else:
+        print("orjson not installed, skipping orjson provider")
+
+    results = {}
+    for name, provider_class in providers:
+        duration, body = benchmark_provider(provider_class, data, args.repeat)
+        results[name] = (duration, body)
+        print("%-8s %8.2f ms  %10d bytes" % (name, duration * 1000, len(body)))
+
+    if 'orjson' in results:
+        # check identical output
+        assert results['orjson'][1] == results['stdlib'][1]
+        print("speedup  %8.1fx" % (results['stdlib'][0] / results['orjson'][0]))
@@ -0,0 +1,153 @@
+"""Concurrent load harness for request coalescing of themes.json and
+config.json requests.
+
+Fires bursts of concurrent requests for the same role set against a
+synthetic tenant, with and without single-flight, and reports the number
+of filter computations, wall time and whether all responses were
+identical.
+
+Usage:
+    python benchmarks/single_flight_load.py [--threads N] [--bursts B]
+        [--themes T] [--layers M]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from viewer_benchmark import create_tenant  # noqa: E402
+
+
+class PassThrough:
+    """Run every call without coalescing."""
+
+    shared = 0
+
+    def do(self, key, func):
+        return func()
+
+
+def run_burst(app, url, threads, headers):
+    """Send concurrent requests and return response bodies and wall time.
+
+    :param Flask app: Map Viewer application
+    :param str url: Request URL
+    :param int threads: Number of concurrent requests
+    :param dict headers: Request headers
+    """
+    barrier = threading.Barrier(threads)
+    bodies = [None] * threads
+
+    def request(i):
+        client = app.test_client()
+        barrier.wait()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.status_code
+        bodies[i] = response.get_data()
+
+    workers = [
+        threading.Thread(target=request, args=(i,)) for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return bodies, time.perf_counter() - start
+
+
+def run_load(app, handler, args, headers, coalesce):
+    """Run bursts of themes.json and config.json requests and print stats.
+
+    :param Flask app: Map Viewer application
+    :param QWC2Viewer handler: Map Viewer handler
+    :param obj args: Command line arguments
+    :param dict headers: Request headers
+    :param bool coalesce: Whether to use single-flight
+    """
+    from single_flight import SingleFlight
+
+    if coalesce:
+        handler.themes_single_flight = SingleFlight()
+        handler.config_single_flight = SingleFlight()
+    else:
+        handler.themes_single_flight = PassThrough()
+        handler.config_single_flight = PassThrough()
+
+    # count actual computations
+    counts = {'themes': 0, 'config': 0}
+    lock = threading.Lock()
+
+    def counting(name, func):
+        def wrapper(*args, **kwargs):
+            with lock:
+                counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    filter_themes = handler.filter_themes
+    build_config = handler.build_config
+    handler.filter_themes = counting('themes', filter_themes)
+    handler.build_config = counting('config', build_config)
+
+    label = "single-flight" if coalesce else "no coalescing"
+    for url, name in [('/themes.json', 'themes'), ('/config.json', 'config')]:
+        counts[name] = 0
+        total_time = 0
+        identical = True
+        for burst in range(args.bursts):
+            # start each burst with empty themes cache
+            handler.themes_cache.clear()
+            bodies, duration = run_burst(app, url, args.threads, headers)
+            total_time += duration
+            identical &= all(body == bodies[0] for body in bodies)
+        print("%-14s %-12s %4d requests  %4d computations  %8.1f ms/burst  identical: %s" % (
+            label, url, args.threads * args.bursts, counts[name],
+            total_time / args.bursts * 1000, identical
+        ))
+
+    handler.filter_themes = filter_themes
+    handler.build_config = build_config
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--threads', type=int, default=32, help="Concurrent requests per burst")
+    parser.add_argument('--bursts', type=int, default=5, help="Number of bursts")
+    parser.add_argument('--themes', type=int, default=50, help="Number of themes")
+    parser.add_argument('--layers', type=int, default=100, help="Data layers per theme")
+    parser.add_argument('--username', default='user_0', help="Signed in user, '' for anonymous")
+    args = parser.parse_args()
+
+    # synthetic tenant without Config DB
+    tenant_args = argparse.Namespace(
+        themes=args.themes, layers=args.layers, depth=4, roles=4, assets=0,
+        form_fields=0, thumbnail_size=0, db='none'
+    )
+
+    with tempfile.TemporaryDirectory(prefix='qwc-map-viewer-load-') as base_dir:
+        create_tenant(base_dir, tenant_args)
+        os.environ['CONFIG_PATH'] = os.path.join(base_dir, 'config')
+        os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-of-sufficient-length')
+
+        from server import app
+        import server
+        app.logger.setLevel(logging.ERROR)
+
+        with app.test_request_context('/'):
+            handler = server.qwc2_viewer_handler()
+
+        headers = {}
+        if args.username:
+            from flask_jwt_extended import create_access_token
+            with app.app_context():
+                headers['Authorization'] = 'Bearer %s' % create_access_token(
+                    {'username': args.username}
+                )
+
+        for coalesce in [False, True]:
+            run_load(app, handler, args, headers, coalesce)
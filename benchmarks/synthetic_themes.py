@@ -0,0 +1,164 @@
+"""Synthetic QWC2 themes for benchmarks."""
+import base64
+
+
+def build_layer_tree(prefix, num_layers, depth, groups_per_level=2):
+    """Return nested layer tree with num_layers data layers distributed over
+    groups with the given nesting depth.
+
+    :param str prefix: Layer name prefix
+    :param int num_layers: Number of data layers
+    :param int depth: Group nesting depth
+    :param int groups_per_level: Number of subgroups per group
+    """
+    if depth <= 0 or num_layers <= groups_per_level:
+        return [
+            {
+                "name": "%s_layer_%d" % (prefix, i),
+                "title": "Layer %d of %s" % (i, prefix),
+                "visibility": i % 2 == 0,
+                "queryable": True,
+                "opacity": 255,
+                "bbox": {
+                    "crs": "EPSG:2056",
+                    "bounds": [2590000, 1210000, 2620000, 1240000]
+                },
+                "attribution": {"Title": "", "OnlineResource": ""},
+                "searchterms": ["facet_%d" % (i % 10)]
+            }
+            for i in range(num_layers)
+        ]
+
+    layers_per_group = num_layers // groups_per_level
+    groups = []
+    for i in range(groups_per_level):
+        count = layers_per_group
+        if i == groups_per_level - 1:
+            count = num_layers - layers_per_group * (groups_per_level - 1)
+        name = "%s_%d" % (prefix, i)
+        groups.append({
+            "name": "%s_group" % name,
+            "title": "Group %s" % name,
+            "expanded": True,
+            "mutuallyExclusive": False,
+            "sublayers": build_layer_tree(name, count, depth - 1, groups_per_level)
+        })
+    return groups
+
+
+def collect_layer_names(layers, names):
+    """Collect names of all layers and groups in layer tree.
+
+    :param list layers: Layer tree
+    :param list names: List for collecting names
+    """
+    for layer in layers:
+        names.append(layer['name'])
+        collect_layer_names(layer.get('sublayers', []), names)
+    return names
+
+
+def build_theme_item(index, num_layers, depth, thumbnail_size=0):
+    """Return synthetic theme item.
+
+    :param int index: Theme index
+    :param int num_layers: Number of data layers
+    :param int depth: Group nesting depth
+    :param int thumbnail_size: Size in bytes of Base64 encoded thumbnail
+                               (0 for none)
+    """
+    wms_name = "theme_%d" % index
+    sublayers = build_layer_tree(wms_name, num_layers, depth)
+    layer_names = collect_layer_names(sublayers, [])
+    data_layers = layer_names[-num_layers:]
+    item = {
+        "id": wms_name,
+        "name": wms_name,
+        "title": "Theme %d" % index,
+        "wms_name": wms_name,
+        "url": "/ows/%s" % wms_name,
+        "attribution": {"Title": "", "OnlineResource": ""},
+        "abstract": "Synthetic theme %d" % index,
+        "keywords": "",
+        "mapCrs": "EPSG:2056",
+        "bbox": {"crs": "EPSG:4326", "bounds": [5.9, 45.8, 10.5, 47.8]},
+        "initialBbox": {"crs": "EPSG:2056", "bounds": [2590000, 1210000, 2620000, 1240000]},
+        "thumbnail": "img/mapthumbs/default.jpg",
+        "version": "1.3.0",
+        "format": "image/png",
+        "availableFormats": ["image/png", "image/jpeg"],
+        "tiled": False,
+        "infoFormats": ["text/xml"],
+        "expanded": True,
+        "backgroundLayers": [
+            {"name": "bg_%d" % i, "printLayer": "bg_%d" % i, "visibility": i == 0}
+            for i in range(3)
+        ],
+        "searchProviders": ["coordinates", {"provider": "solr", "default": ["foreground"]}],
+        "sublayers": sublayers,
+        "print": [
+            {"name": "A4 Landscape %d" % i, "title": "A4 Landscape %d" % i,
+             "map": {"name": "map0", "width": 277, "height": 183}}
+            for i in range(4)
+        ],
+        "drawingOrder": list(reversed(data_layers)),
+        "editConfig": {
+            layer: {
+                "layerName": layer,
+                "geomType": "Point",
+                "fields": [
+                    {"id": "id", "name": "id", "type": "number"},
+                    {"id": "name", "name": "Name", "type": "text"},
+                    {"id": "value", "name": "Value", "type": "number"}
+                ],
+                "permissions": {"creatable": True, "updatable": True, "deletable": True}
+            }
+            for layer in data_layers[:max(1, num_layers // 10)]
+        },
+        "translations": {
+            "de": {"layertree": {layer: "Ebene %s" % layer for layer in data_layers}}
+        }
+    }
+    if thumbnail_size > 0:
+        item["thumbnail_base64"] = base64.b64encode(
+            b'\x89PNG\r\n\x1a\n'
+            + bytes(i % 256 for i in range(thumbnail_size * 3 // 4))
+        ).decode('ascii')
+
+    return item
+
+
+def build_themes(num_themes, num_layers, depth, thumbnail_size=0):
+    """Return synthetic qwc2_themes resource.
+
+    :param int num_themes: Number of themes
+    :param int num_layers: Number of data layers per theme
+    :param int depth: Group nesting depth
+    :param int thumbnail_size: Size in bytes of Base64 encoded thumbnails
+    """
+    items = [
+        build_theme_item(i, num_layers, depth, thumbnail_size)
+        for i in range(num_themes)
+    ]
+    return {
+        "themes": {
+            "title": "root",
+            "subdirs": [
+                {"id": "group_%d" % g, "title": "Group %d" % g, "items": items[g::2], "subdirs": []}
+                for g in range(2)
+            ],
+            "items": [],
+            "defaultTheme": items[0]["id"] if items else None,
+            "externalLayers": [],
+            "backgroundLayers": [
+                {"name": "bg_%d" % i, "title": "Background %d" % i, "type": "wms",
+                 "url": "/ows/bg", "params": {"LAYERS": "bg_%d" % i}}
+                for i in range(3)
+            ],
+            "themeInfoLinks": [],
+            "pluginData": {},
+            "defaultScales": [1000000, 500000, 250000, 100000, 50000, 25000, 10000, 5000, 2500, 1000, 500],
+            "defaultPrintResolutions": [300],
+            "defaultPrintGrid": [{"s": 10000000, "x": 1000000, "y": 1000000}]
+        }
+    }
@@ -0,0 +1,446 @@
+"""Benchmark suite for the QWC2Viewer hot paths on a synthetic tenant.
+
+Generates a tenant with N themes, M layers per theme, nested layer groups,
+many roles with different permission sets, Base64 thumbnails and designer
+forms. Measures latency, allocated and peak memory (tracemalloc) of
+permitted_themes, qwc2_config, edit_config, qwc2_assets and
+translate_designer_form. Runs offline, with the user info fields read
+from an SQLite Config DB or without a Config DB.
+
+Permission lookups are answered by a FixedPermissionsReader with fixed
+permissions per identity, so that the results measure the filtering cost
+of the viewer only.
+
+Usage:
+    python benchmarks/viewer_benchmark.py [--themes N] [--layers M]
+        [--depth D] [--roles R] [--db sqlite|none] [--repeat K]
+        [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from synthetic_themes import build_themes, collect_layer_names  # noqa: E402
+
+
+# tolerated slowdown vs baseline before reporting a regression
+REGRESSION_THRESHOLD = 1.2
+
+
+def create_tenant(base_dir, args):
+    """Write config, permissions, index.html and QWC2 files of a synthetic
+    tenant and return the config dir.
+
+    :param str base_dir: Target dir
+    :param obj args: Command line arguments
+    """
+    config_dir = os.path.join(base_dir, 'config', 'default')
+    qwc2_path = os.path.join(base_dir, 'qwc2')
+    for subdir in ['assets/forms', 'assets/img', 'dist', 'translations']:
+        os.makedirs(os.path.join(qwc2_path, subdir), exist_ok=True)
+    os.makedirs(config_dir, exist_ok=True)
+
+    with open(os.path.join(config_dir, 'index.html'), 'w') as f:
+        f.write(
+            '<html><head><title>QWC2</title>'
+            '<script src="dist/QWC2App.js?0123456789abcdef"></script>'
+            '</head><body><script>init();</script></body></html>'
+        )
+
+    # assets with localized variants and designer forms
+    for i in range(args.assets):
+        with open(os.path.join(qwc2_path, 'assets', 'img', 'icon_%d.svg' % i), 'w') as f:
+            f.write('<svg id="%d"/>' % i)
+        if i % 2 == 0:
+            with open(os.path.join(qwc2_path, 'assets', 'img', 'icon_%d_de.svg' % i), 'w') as f:
+                f.write('<svg id="%d" lang="de"/>' % i)
+    strings = ["Field %d" % i for i in range(args.form_fields)]
+    with open(os.path.join(qwc2_path, 'assets', 'forms', 'form.ui'), 'w') as f:
+        f.write('<ui version="4.0"><widget class="QWidget">%s</widget></ui>' % "".join(
+            '<widget class="QLabel"><property name="text"><string>%s</string></property></widget>' % s
+            for s in strings
+        ))
+    with open(os.path.join(qwc2_path, 'assets', 'forms', 'form_de.ts'), 'w') as f:
+        f.write('<TS version="2.1"><context><name>form</name>%s</context></TS>' % "".join(
+            '<message><source>%s</source><translation>Feld %s</translation></message>' % (s, s[6:])
+            for s in strings
+        ))
+
+    themes = build_themes(args.themes, args.layers, args.depth, args.thumbnail_size)
+    theme_items = [
+        item for group in themes['themes']['subdirs'] for item in group['items']
+    ]
+
+    viewer_config = {
+        "$schema": "https://raw.githubusercontent.com/qwc-services/qwc-map-viewer/master/schemas/qwc-map-viewer.json",
+        "service": "map-viewer",
+        "config": {
+            "qwc2_path": qwc2_path,
+            "ogc_service_url": "/ows/",
+            "auth_service_url": "/auth/",
+            "db_url": "sqlite:///%s" % os.path.join(base_dir, 'main.db') if args.db == 'sqlite' else "",
+            "user_info_fields": ["surname"] if args.db == 'sqlite' else [],
+            "show_restricted_themes": True,
+            "flag_themes_with_restricted_content": True
+        },
+        "resources": {
+            "qwc2_config": {
+                "config": {
+                    "assetsPath": "/assets",
+                    "plugins": {
+                        "common": [{"name": "Print"}, {"name": "RasterExport"}],
+                        "mobile": [{"name": "TopBar", "cfg": {"menuItems": [
+                            {"key": "Login"}, {"key": "Print"}, {"key": "RasterExport"}
+                        ]}}],
+                        "desktop": [{"name": "TopBar", "cfg": {"menuItems": [
+                            {"key": "Login"}, {"key": "Print"}, {"key": "RasterExport"}
+                        ]}}]
+                    }
+                }
+            },
+            "qwc2_themes": themes
+        }
+    }
+    with open(os.path.join(config_dir, 'mapViewerConfig.json'), 'w') as f:
+        json.dump(viewer_config, f)
+
+    # each role permits a different subset of themes, layers and datasets
+    roles = []
+    for r in range(args.roles):
+        wms_services = []
+        data_datasets = []
+        for t, item in enumerate(theme_items):
+            if (t + r) % 3 == 2:
+                continue
+            layer_names = collect_layer_names(item['sublayers'], [item['wms_name']])
+            permitted_layers = [
+                name for l, name in enumerate(layer_names) if (l + r) % 4 != 3
+            ]
+            wms_services.append({
+                "name": item['wms_name'],
+                "layers": [{"name": name} for name in permitted_layers],
+                "print_templates": [p['name'] for p in item['print'][r % 2::2]]
+            })
+            data_datasets += [
+                {"name": "%s.%s" % (item['wms_name'], layer), "attributes": ["id", "name"],
+                 "writable": r % 2 == 0}
+                for layer in item['editConfig']
+            ]
+        roles.append({
+            "role": "role_%d" % r,
+            "permissions": {
+                "wms_services": wms_services,
+                "data_datasets": data_datasets,
+                "background_layers": ["bg_%d" % (r % 3)],
+                "solr_facets": ["facet_%d" % i for i in range(r % 10)],
+                "viewer_assets": ["img/icon_1*"] if r % 2 else []
+            }
+        })
+    roles.append({
+        "role": "public",
+        "permissions": {
+            "wms_services": [{"name": theme_items[0]['wms_name'], "layers": [
+                {"name": name} for name in collect_layer_names(
+                    theme_items[0]['sublayers'], [theme_items[0]['wms_name']]
+                )
+            ]}] if theme_items else [],
+            "background_layers": ["bg_0"],
+            "viewer_assets": [],
+            "viewer_tasks": []
+        }
+    })
+    permissions = {
+        "$schema": "https://github.com/qwc-services/qwc-services-core/raw/master/schemas/qwc-services-permissions.json",
+        "users": [
+            {"name": "user_%d" % u, "groups": [], "roles": ["role_%d" % (u % args.roles), "role_%d" % ((u + 1) % args.roles)]}
+            for u in range(args.roles)
+        ],
+        "groups": [],
+        "roles": roles
+    }
+    with open(os.path.join(config_dir, 'permissions.json'), 'w') as f:
+        json.dump(permissions, f)
+
+    if args.db == 'sqlite':
+        create_config_db(base_dir, args.roles)
+
+    return config_dir
+
+
+def create_config_db(base_dir, num_users):
+    """Create SQLite Config DB with users and user infos.
+
+    :param str base_dir: Target dir
+    :param int num_users: Number of users
+    """
+    conn = sqlite3.connect(os.path.join(base_dir, 'qwc_config.db'))
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute(
+        "CREATE TABLE user_infos (user_id INTEGER PRIMARY KEY, surname TEXT, "
+        "default_url_params TEXT)"
+    )
+    for u in range(num_users):
+        conn.execute("INSERT INTO users VALUES (?, ?)", (u, "user_%d" % u))
+        conn.execute("INSERT INTO user_infos VALUES (?, ?, '')", (u, "Surname %d" % u))
+    conn.commit()
+    conn.close()
+
+
+def attach_config_db(base_dir):
+    """Attach SQLite Config DB as qwc_config schema to the viewer DB engine.
+
+    :param str base_dir: Dir of SQLite DBs
+    """
+    from sqlalchemy import event
+    import qwc2_viewer
+
+    engine = qwc2_viewer.db_engine.db_engine(
+        "sqlite:///%s" % os.path.join(base_dir, 'main.db')
+    )
+
+    @event.listens_for(engine, 'connect')
+    def attach(dbapi_connection, connection_record):
+        dbapi_connection.execute(
+            "ATTACH DATABASE '%s' AS qwc_config" %
+            os.path.join(base_dir, 'qwc_config.db')
+        )
+
+
+def measure(func, repeat, setup=None):
+    """Return latency and memory stats of func.
+
+    :param func func: Benchmarked function
+    :param int repeat: Number of repetitions
+    :param func setup: Optional function called before each repetition
+    """
+    durations = []
+    for i in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    # measure memory in separate run, as tracing slows down execution
+    if setup:
+        setup()
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    func()
+    end_memory, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'median_ms': statistics.median(durations) * 1000,
+        'p95_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000,
+        'retained_kib': (end_memory - start_memory) / 1024,
+        'peak_kib': (peak_memory - start_memory) / 1024
+    }
+
+
+class FixedPermissionsReader:
+    """Stub of PermissionsReader which returns fixed permissions.
+
+    Permissions are resolved once per lookup by the wrapped PermissionsReader
+    and then returned unchanged.
+    """
+
+    def __init__(self, permissions_reader):
+        """Constructor
+
+        :param PermissionsReader permissions_reader: Wrapped permissions reader
+        """
+        self.permissions_reader = permissions_reader
+        self.permissions = permissions_reader.permissions
+        self.lookups = {}
+
+    def lookup(self, method, *args):
+        """Return fixed result of PermissionsReader method for arguments.
+
+        :param str method: PermissionsReader method name
+        :param list args: Method arguments
+        """
+        key = json.dumps([method, args], sort_keys=True)
+        if key not in self.lookups:
+            self.lookups[key] = getattr(self.permissions_reader, method)(*args)
+        # return new list, like PermissionsReader
+        return list(self.lookups[key])
+
+    def identity_roles(self, identity):
+        return self.lookup('identity_roles', identity)
+
+    def resource_permissions(self, resource_key, identity, resource_name=None):
+        return self.lookup(
+            'resource_permissions', resource_key, identity, resource_name
+        )
+
+    def resource_restrictions(self, resource_key, identity, subresource_filter=[]):
+        return self.lookup(
+            'resource_restrictions', resource_key, identity, subresource_filter
+        )
+
+    def permissions_default_allow(self):
+        return self.permissions_reader.permissions_default_allow()
+
+
+def fetch_assets(handler, identity, count):
+    """Request localized assets, some of which are restricted.
+
+    :param QWC2Viewer handler: Map Viewer handler
+    :param obj identity: User identity
+    :param int count: Number of assets
+    """
+    from werkzeug.exceptions import NotFound
+
+    for i in range(count):
+        try:
+            handler.qwc2_assets('img/icon_%d.svg' % i, identity, 'de-CH').close()
+        except NotFound:
+            # restricted asset
+            pass
+
+
+def run_benchmarks(app, args):
+    """Run all benchmarks and return results by benchmark name.
+
+    :param Flask app: Map Viewer application
+    :param obj args: Command line arguments
+    """
+    import server
+
+    identities = [None] + [
+        {'username': 'user_%d' % u} for u in range(min(args.roles, 4))
+    ]
+    first_item = next(
+        group['items'][0]
+        for group in server.qwc2_viewer_handler().resources['qwc2_themes']['subdirs']
+        if group['items']
+    )
+    wms_name = first_item['wms_name']
+    edit_layers = list(first_item['editConfig'].keys())[:2]
+
+    handler = server.qwc2_viewer_handler()
+    # isolate filtering cost from permission lookups
+    handler.permissions_handler = FixedPermissionsReader(
+        handler.permissions_handler
+    )
+    benchmarks = [
+        ('permitted_themes (cold)',
+         lambda identity: handler.permitted_themes(identity, None),
+         handler.themes_cache.clear),
+        ('permitted_themes (cached)',
+         lambda identity: handler.permitted_themes(identity, None), None),
+        ('permitted_themes lang=de (cold)',
+         lambda identity: handler.permitted_themes(identity, 'de'),
+         handler.themes_cache.clear),
+        ('qwc2_themes (cached)',
+         lambda identity: handler.qwc2_themes(identity, None).get_data(), None),
+        ('qwc2_config',
+         lambda identity: handler.qwc2_config(identity, {}).get_data(), None),
+        ('edit_config (all)',
+         lambda identity: handler.edit_config(identity, wms_name, None).get_data(), None),
+        ('edit_config (layers)',
+         lambda identity: handler.edit_config(identity, wms_name, edit_layers).get_data(), None),
+        ('qwc2_assets',
+         lambda identity: fetch_assets(handler, identity, min(args.assets, 50)),
+         None),
+        ('translate_designer_form (cold)',
+         lambda identity: handler.translate_designer_form('forms/form.ui', 'de-CH').get_data(),
+         handler.designer_form_cache.clear),
+        ('translate_designer_form (cached)',
+         lambda identity: handler.translate_designer_form('forms/form.ui', 'de-CH').get_data(),
+         None),
+    ]
+
+    results = {}
+    for name, func, setup in benchmarks:
+        stats = []
+        for identity in identities:
+            # warm up
+            func(identity)
+            stats.append(measure(lambda: func(identity), args.repeat, setup))
+        results[name] = {
+            key: statistics.mean(s[key] for s in stats) for key in stats[0]
+        }
+    return results
+
+
+def print_results(results, baseline=None):
+    """Print results table and return names of regressed benchmarks.
+
+    :param dict results: Results by benchmark name
+    :param dict baseline: Optional baseline results by benchmark name
+    """
+    regressions = []
+    print("%-34s %10s %10s %13s %10s %s" % (
+        'benchmark', 'median ms', 'p95 ms', 'retained KiB', 'peak KiB',
+        'vs baseline' if baseline else ''
+    ))
+    for name, stats in results.items():
+        comparison = ''
+        if baseline and name in baseline:
+            ratio = stats['median_ms'] / max(baseline[name]['median_ms'], 1e-6)
+            comparison = "%.2fx" % ratio
+            if ratio > REGRESSION_THRESHOLD:
+                comparison += " REGRESSION"
+                regressions.append(name)
+        print("%-34s %10.3f %10.3f %13.1f %10.1f %s" % (
+            name, stats['median_ms'], stats['p95_ms'], stats['retained_kib'],
+            stats['peak_kib'], comparison
+        ))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--themes', type=int, default=50, help="Number of themes")
+    parser.add_argument('--layers', type=int, default=100, help="Data layers per theme")
+    parser.add_argument('--depth', type=int, default=4, help="Group nesting depth")
+    parser.add_argument('--roles', type=int, default=20, help="Number of roles and users")
+    parser.add_argument('--assets', type=int, default=200, help="Number of asset files")
+    parser.add_argument('--form-fields', type=int, default=200, help="Strings in designer form")
+    parser.add_argument('--thumbnail-size', type=int, default=20000, help="Size of Base64 thumbnails")
+    parser.add_argument('--db', choices=['sqlite', 'none'], default='sqlite', help="Config DB")
+    parser.add_argument('--repeat', type=int, default=10, help="Repetitions per identity")
+    parser.add_argument('--output', help="Write results as JSON to file")
+    parser.add_argument('--compare', help="Compare with baseline results JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='qwc-map-viewer-benchmark-') as base_dir:
+        create_tenant(base_dir, args)
+        os.environ['CONFIG_PATH'] = os.path.join(base_dir, 'config')
+        os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-of-sufficient-length')
+        if args.db == 'sqlite':
+            attach_config_db(base_dir)
+
+        from server import app
+        app.logger.setLevel(logging.ERROR)
+
+        with app.test_request_context('/'):
+            start = time.perf_counter()
+            import server
+            server.qwc2_viewer_handler()
+            print("Handler setup: %.1f ms" % ((time.perf_counter() - start) * 1000))
+            results = run_benchmarks(app, args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    regressions = print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+    if regressions:
+        sys.exit(1)
@@ -0,0 +1,119 @@
+import codecs
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def escape_non_ascii(error):
+    """Codec error handler returning JSON escape sequences of non-ASCII
+    characters, as written by the stdlib json module.
+
+    :param UnicodeEncodeError error: Encode error of non-ASCII characters
+    """
+    escaped = []
+    for char in error.object[error.start:error.end]:
+        code_point = ord(char)
+        if code_point < 0x10000:
+            escaped.append('\\u%04x' % code_point)
+        else:
+            # UTF-16 surrogate pair
+            code_point -= 0x10000
+            escaped.append('\\u%04x\\u%04x' % (
+                0xd800 | (code_point >> 10), 0xdc00 | (code_point & 0x3ff)
+            ))
+    return ''.join(escaped), error.end
+
+
+codecs.register_error('json_escape_non_ascii', escape_non_ascii)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """OrjsonProvider class
+
+    JSON provider using orjson for JSON responses and parsing JSON, with
+    the same output as the default stdlib provider (sorted keys, compact or
+    indented output, escaped non-ASCII characters if ensure_ascii is set,
+    Flask's default serialization of additional data types).
+
+    NOTE: floats differ deliberately, as detecting them would require a
+          full traversal of the data: NaN and Infinity are serialized as
+          null (instead of the invalid JSON NaN and Infinity) and floats in
+          exponent notation are formatted as e.g. 1e16 instead of 1e+16
+
+    NOTE: dumps() always uses the stdlib, as orjson does not support its
+          default separators
+    """
+
+    def loads(self, s, **kwargs):
+        """Deserialize data from JSON string or bytes.
+
+        :param str s: Text or UTF-8 bytes
+        :param kwargs: Optional arguments passed to json.loads
+        """
+        if kwargs:
+            return super().loads(s, **kwargs)
+
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # e.g. NaN or integers exceeding 64 bit, which are accepted by
+            # the stdlib
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        """Serialize the given arguments as JSON and return a response.
+
+        :param args: A single value to serialize, or multiple values to
+                     treat as a list to serialize
+        :param kwargs: Treat as a dict to serialize
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+
+        option = self.orjson_options() | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+
+        try:
+            data = orjson.dumps(obj, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers exceeding 64 bit or non-string keys
+            return super().response(obj)
+
+        if self.ensure_ascii:
+            if not data.isascii():
+                data = data.decode('utf-8').encode(
+                    'ascii', 'json_escape_non_ascii'
+                )
+            if b'\x7f' in data:
+                # DEL is escaped by the stdlib, but not by orjson
+                # NOTE: control characters only occur within strings
+                data = data.replace(b'\x7f', b'\\u007f')
+
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+    def orjson_options(self):
+        """Return orjson options matching the stdlib provider settings."""
+        # NOTE: serialize datetime with Flask's default function
+        # NOTE: non-string keys are not supported, as orjson sorts them
+        #       differently than the stdlib
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+
+def json_provider_class():
+    """Return JSON provider class selected by env var JSON_PROVIDER.
+
+    Use orjson if installed, unless JSON_PROVIDER is set to 'stdlib'.
+    """
+    json_provider = os.environ.get('JSON_PROVIDER', 'orjson').lower()
+    if json_provider == 'orjson' and orjson is not None:
+        return OrjsonProvider
+    else:
+        return DefaultJSONProvider
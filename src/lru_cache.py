@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """LRUCache class
+
+    Thread-safe size bounded cache with least recently used eviction and
+    optional expiry of entries.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        """Constructor
+
+        :param int max_size: Max number of cached entries (0 to disable cache)
+        :param float ttl: Optional time in seconds until entries expire
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        # entries as {<key>: (<value>, <expiry timestamp or None>)}
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # number of cache hits and misses for metrics
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, record_stats=True):
+        """Return cached value for key or None if not present or expired.
+
+        :param obj key: Cache key
+        :param bool record_stats: Whether to count the lookup as hit or miss
+                                  (e.g. disable when re-checking a miss)
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                if record_stats:
+                    self.misses += 1
+                return None
+
+            value, expires = entry
+            if expires is not None and time.monotonic() >= expires:
+                # remove expired entry
+                del self.entries[key]
+                if record_stats:
+                    self.misses += 1
+                return None
+
+            # mark as most recently used
+            self.entries.move_to_end(key)
+            if record_stats:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value for key and evict least recently used entries.
+
+        :param obj key: Cache key
+        :param obj value: Value to store
+        """
+        if self.max_size <= 0:
+            # cache disabled
+            return
+
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove any cached entry for key.
+
+        :param obj key: Cache key
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """Remove all cached entries."""
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,283 @@
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from flask import g, has_request_context
+
+
+def env_flag(name):
+    """Return whether boolean env var is set.
+
+    :param str name: Env var name
+    """
+    return os.environ.get(name, '').lower() in ('true', 't', '1', 'on', 'yes', 'y')
+
+
+class Metrics:
+    """Metrics class
+
+    Collect per-request durations of processing stages, response sizes,
+    Config DB round trips and cache hit ratios, and export them in the
+    Prometheus text format or as Server-Timing response header.
+
+    NOTE: metrics are collected per process
+    """
+
+    # upper bounds in seconds of request duration histogram buckets
+    DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+    # shared no-op context manager if metrics are disabled
+    NO_STAGE = nullcontext()
+
+    def __init__(self, enabled, server_timing):
+        """Constructor
+
+        :param bool enabled: Whether to collect metrics for /metrics
+        :param bool server_timing: Whether to add Server-Timing headers
+        """
+        self.enabled = enabled
+        self.server_timing = server_timing
+        self.active = enabled or server_timing
+
+        self.lock = threading.Lock()
+        # request counts as {(<endpoint>, <status>): <count>}
+        self.requests = {}
+        # request duration histograms as
+        # {<endpoint>: [<bucket counts>..., <+Inf count>, <sum>]}
+        self.durations = {}
+        # stage durations as {(<endpoint>, <stage>): [<sum>, <count>]}
+        self.stages = {}
+        # response sizes as {<endpoint>: [<sum>, <count>]}
+        self.response_sizes = {}
+        # Config DB round trips as {<endpoint>: <count>}
+        self.db_round_trips = {}
+        # caches of latest handler by tenant as
+        # {<tenant>: {<cache name>: <LRUCache>}}
+        self.caches = {}
+
+    def start_request(self):
+        """Start timing of current request."""
+        if self.active:
+            g.metrics_start = time.perf_counter()
+            g.metrics_stages = {}
+
+    def stage(self, name):
+        """Return context manager for timing a processing stage of the
+        current request.
+
+        Usage:
+            with metrics.stage('filter_themes'):
+                ...
+
+        :param str name: Stage name
+        """
+        if not self.active or not has_request_context() or 'metrics_stages' not in g:
+            return self.NO_STAGE
+        return self.stage_timer(g.metrics_stages, name)
+
+    @contextmanager
+    def stage_timer(self, stages, name):
+        """Add duration of context to stage durations.
+
+        :param dict stages: Stage durations of current request
+        :param str name: Stage name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages[name] = stages.get(name, 0) + time.perf_counter() - start
+
+    def finish_request(self, endpoint, response):
+        """Record metrics of current request and add Server-Timing header.
+
+        :param str endpoint: Request endpoint
+        :param obj response: Response
+        """
+        if not self.active or 'metrics_start' not in g:
+            return response
+
+        duration = time.perf_counter() - g.metrics_start
+        stages = g.metrics_stages
+
+        if self.enabled:
+            self.observe_request(
+                endpoint or 'unknown', response.status_code, duration,
+                response.content_length or 0, stages,
+                g.get('db_round_trips', 0)
+            )
+
+        if self.server_timing:
+            timings = [
+                '%s;dur=%.3f' % (name, stage_duration * 1000)
+                for name, stage_duration in stages.items()
+            ]
+            timings.append('total;dur=%.3f' % (duration * 1000))
+            response.headers['Server-Timing'] = ", ".join(timings)
+
+        return response
+
+    def observe_request(self, endpoint, status, duration, size, stages,
+                        db_round_trips):
+        """Record metrics of a request.
+
+        :param str endpoint: Request endpoint
+        :param int status: Response status code
+        :param float duration: Request duration in seconds
+        :param int size: Response size in bytes
+        :param dict stages: Stage durations in seconds
+        :param int db_round_trips: Number of Config DB round trips
+        """
+        with self.lock:
+            key = (endpoint, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            histogram = self.durations.get(endpoint)
+            if histogram is None:
+                histogram = [0] * (len(self.DURATION_BUCKETS) + 2)
+                self.durations[endpoint] = histogram
+            for i, bound in enumerate(self.DURATION_BUCKETS):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += duration
+
+            for name, stage_duration in stages.items():
+                stage = self.stages.setdefault((endpoint, name), [0, 0])
+                stage[0] += stage_duration
+                stage[1] += 1
+
+            response_size = self.response_sizes.setdefault(endpoint, [0, 0])
+            response_size[0] += size
+            response_size[1] += 1
+
+            if db_round_trips:
+                self.db_round_trips[endpoint] = \
+                    self.db_round_trips.get(endpoint, 0) + db_round_trips
+
+    def register_caches(self, tenant, caches):
+        """Register caches of tenant handler for cache metrics.
+
+        NOTE: replaces any caches of a previous handler of the tenant
+
+        :param str tenant: Tenant ID
+        :param dict caches: LRUCaches by cache name
+        """
+        if self.enabled:
+            with self.lock:
+                self.caches[tenant] = caches
+
+    def render(self):
+        """Return metrics in Prometheus text format."""
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+            for suffix, labels, value in samples:
+                label_str = ",".join(
+                    '%s="%s"' % (key, self.escape_label(val))
+                    for key, val in labels
+                )
+                lines.append("%s%s{%s} %s" % (name, suffix, label_str, value))
+
+        with self.lock:
+            metric(
+                'qwc_map_viewer_requests_total', 'counter',
+                "Number of requests by endpoint and status",
+                [
+                    ('', [('endpoint', endpoint), ('status', status)], count)
+                    for (endpoint, status), count in sorted(self.requests.items())
+                ]
+            )
+
+            samples = []
+            for endpoint, histogram in sorted(self.durations.items()):
+                for i, bound in enumerate(self.DURATION_BUCKETS):
+                    samples.append((
+                        '_bucket', [('endpoint', endpoint), ('le', str(bound))],
+                        histogram[i]
+                    ))
+                samples.append((
+                    '_bucket', [('endpoint', endpoint), ('le', '+Inf')],
+                    histogram[-2]
+                ))
+                samples.append(('_sum', [('endpoint', endpoint)], histogram[-1]))
+                samples.append(('_count', [('endpoint', endpoint)], histogram[-2]))
+            metric(
+                'qwc_map_viewer_request_duration_seconds', 'histogram',
+                "Request duration in seconds by endpoint", samples
+            )
+
+            samples = []
+            for (endpoint, name), (total, count) in sorted(self.stages.items()):
+                labels = [('endpoint', endpoint), ('stage', name)]
+                samples.append(('_sum', labels, total))
+                samples.append(('_count', labels, count))
+            metric(
+                'qwc_map_viewer_stage_duration_seconds', 'summary',
+                "Duration in seconds of processing stages by endpoint", samples
+            )
+
+            samples = []
+            for endpoint, (total, count) in sorted(self.response_sizes.items()):
+                samples.append(('_sum', [('endpoint', endpoint)], total))
+                samples.append(('_count', [('endpoint', endpoint)], count))
+            metric(
+                'qwc_map_viewer_response_size_bytes', 'summary',
+                "Response size in bytes by endpoint", samples
+            )
+
+            metric(
+                'qwc_map_viewer_db_round_trips_total', 'counter',
+                "Number of Config DB round trips by endpoint",
+                [
+                    ('', [('endpoint', endpoint)], count)
+                    for endpoint, count in sorted(self.db_round_trips.items())
+                ]
+            )
+
+            caches = [
+                (tenant, name, cache)
+                for tenant, tenant_caches in sorted(self.caches.items())
+                for name, cache in sorted(tenant_caches.items())
+            ]
+
+        metric(
+            'qwc_map_viewer_cache_hits_total', 'counter',
+            "Number of cache hits by tenant and cache",
+            [
+                ('', [('tenant', tenant), ('cache', name)], cache.hits)
+                for tenant, name, cache in caches
+            ]
+        )
+        metric(
+            'qwc_map_viewer_cache_misses_total', 'counter',
+            "Number of cache misses by tenant and cache",
+            [
+                ('', [('tenant', tenant), ('cache', name)], cache.misses)
+                for tenant, name, cache in caches
+            ]
+        )
+        metric(
+            'qwc_map_viewer_cache_entries', 'gauge',
+            "Number of cached entries by tenant and cache",
+            [
+                ('', [('tenant', tenant), ('cache', name)], len(cache.entries))
+                for tenant, name, cache in caches
+            ]
+        )
+
+        return "\n".join(lines) + "\n"
+
+    def escape_label(self, value):
+        """Escape Prometheus label value.
+
+        :param str value: Label value
+        """
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# global metrics, enabled by env vars
+metrics = Metrics(env_flag('METRICS_ENABLED'), env_flag('SERVER_TIMING'))
@@ -0,0 +1,128 @@
+"""Generate precompressed .gz and .br siblings of static QWC2 files.
+
+Usage:
+    python precompress.py [--min-size BYTES] [--force] <qwc2_path>
+
+The .br files are only generated if the brotli module is installed.
+Enable 'serve_precompressed_files' in the Map Viewer config to serve them.
+"""
+import argparse
+import gzip
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# static dirs in qwc2_path
+STATIC_DIRS = ['assets', 'data', 'dist', 'translations']
+
+# extensions of compressible files
+COMPRESSIBLE_EXTENSIONS = [
+    '.css', '.csv', '.geojson', '.html', '.js', '.json', '.map', '.mjs',
+    '.svg', '.ts', '.txt', '.ui', '.wasm', '.xml'
+]
+
+
+def compress_gzip(file_path, target_path):
+    """Write gzip compressed copy of file.
+
+    :param str file_path: Source file path
+    :param str target_path: Target file path
+    """
+    with open(file_path, 'rb') as f_in:
+        with gzip.open(target_path, 'wb', compresslevel=9) as f_out:
+            shutil.copyfileobj(f_in, f_out)
+
+
+def compress_brotli(file_path, target_path):
+    """Write brotli compressed copy of file.
+
+    :param str file_path: Source file path
+    :param str target_path: Target file path
+    """
+    with open(file_path, 'rb') as f_in:
+        data = brotli.compress(f_in.read(), quality=11)
+    with open(target_path, 'wb') as f_out:
+        f_out.write(data)
+
+
+def precompress_file(file_path, min_size, force):
+    """Generate precompressed siblings of a file if missing or outdated.
+
+    Return number of written files.
+
+    :param str file_path: Source file path
+    :param int min_size: Min file size in bytes
+    :param bool force: Whether to overwrite up-to-date files
+    """
+    if os.path.getsize(file_path) < min_size:
+        return 0
+
+    compressors = [('.gz', compress_gzip)]
+    if brotli is not None:
+        compressors.append(('.br', compress_brotli))
+
+    count = 0
+    mtime = os.path.getmtime(file_path)
+    for ext, compress in compressors:
+        target_path = file_path + ext
+        if (
+            not force and os.path.isfile(target_path)
+            and os.path.getmtime(target_path) >= mtime
+        ):
+            # up-to-date
+            continue
+
+        # write to temp file and replace atomically
+        tmp_path = target_path + '.tmp'
+        compress(file_path, tmp_path)
+        os.replace(tmp_path, target_path)
+        count += 1
+
+    return count
+
+
+def precompress(qwc2_path, min_size, force):
+    """Generate precompressed siblings of all compressible static files.
+
+    :param str qwc2_path: Path to QWC2 files
+    :param int min_size: Min file size in bytes
+    :param bool force: Whether to overwrite up-to-date files
+    """
+    count = 0
+    for static_dir in STATIC_DIRS:
+        for root, dirs, files in os.walk(os.path.join(qwc2_path, static_dir)):
+            for filename in files:
+                ext = os.path.splitext(filename)[1].lower()
+                if ext not in COMPRESSIBLE_EXTENSIONS:
+                    continue
+                count += precompress_file(
+                    os.path.join(root, filename), min_size, force
+                )
+
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Generate precompressed .gz and .br static QWC2 files"
+    )
+    parser.add_argument('qwc2_path', help="Path to QWC2 files")
+    parser.add_argument(
+        '--min-size', type=int, default=1024,
+        help="Min file size in bytes (default: 1024)"
+    )
+    parser.add_argument(
+        '--force', action='store_true',
+        help="Overwrite up-to-date precompressed files"
+    )
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli module not installed, skipping .br files")
+    count = precompress(args.qwc2_path, args.min_size, args.force)
+    print("Wrote %d precompressed files" % count)
@@ -1,20 +1,43 @@
 import base64
 import fnmatch
+import gzip
+import hashlib
+import io
+import mimetypes
 import os
+import re
 import requests
 import secrets
+import stat
 import tempfile
+import threading
+import time
 from urllib.parse import urlparse, urlunparse, urlencode, urljoin, parse_qsl
 from xml.etree import ElementTree
 from sqlalchemy.sql import text as sql_text
 
-from flask import abort, json, jsonify, redirect, send_from_directory, Response, url_for, make_response
+from flask import abort, g, json, jsonify, redirect, request, send_from_directory, Response, url_for, make_response
 from flask_jwt_extended import get_jwt
+from werkzeug.security import safe_join
 
 from qwc_services_core.database import DatabaseEngine
 from qwc_services_core.permissions_reader import PermissionsReader
 from qwc_services_core.runtime_config import RuntimeConfig
 
+from lru_cache import LRUCache
+from metrics import metrics
+from single_flight import SingleFlight
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
 
 db_engine = DatabaseEngine()
 
@@ -31,6 +54,49 @@ class QWC2Viewer:
 
     DEFAULT_THUMBNAIL_IMAGE = 'img/mapthumbs/default.jpg'
 
+    # Cache-Control max-age in seconds for content addressed thumbnails
+    THUMBNAIL_MAX_AGE = 31536000
+
+    # transcoded thumbnail formats as
+    # {<name>: (<Pillow format>, <mimetype>, <file extension>)}
+    THUMBNAIL_FORMATS = {
+        'png': ('PNG', 'image/png', '.png'),
+        'webp': ('WEBP', 'image/webp', '.webp'),
+        'avif': ('AVIF', 'image/avif', '.avif')
+    }
+
+    # insertion points in index.html for CSRF token and CSP nonces
+    INDEX_TEMPLATE_SLOTS_RE = re.compile(r'(<head>|<script |<script>|</head>)')
+
+    # max number of users in user info cache
+    USER_INFO_CACHE_SIZE = 1000
+
+    # max number of resolved permalinks in permalink cache
+    PERMALINK_CACHE_SIZE = 1000
+
+    # max number of compiled viewer_assets matchers in cache
+    VIEWER_ASSETS_MATCHER_CACHE_SIZE = 100
+
+    # content hash of JS bundles, i.e. at least 16 hex digits with both
+    # digits and letters, so that dates or version numbers do not match
+    # NOTE: webpack uses 20 hex digits by default
+    CONTENT_HASH_PATTERN = (
+        r'(?=[0-9a-fA-F]*[0-9])(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{16,}'
+    )
+    # content hash in filename of JS bundles,
+    # e.g. 'chunk.0123456789abcdef0123.js'
+    HASHED_FILENAME_RE = re.compile(
+        r'[.-]%s\.[^/]+$' % CONTENT_HASH_PATTERN
+    )
+    # content hash in query string of JS bundles,
+    # e.g. 'QWC2App.js?0123456789abcdef0123'
+    HASHED_QUERY_RE = re.compile(
+        r'^(?:[\w-]+=)?%s$' % CONTENT_HASH_PATTERN
+    )
+
+    # precompressed file extensions by content encoding in order of preference
+    PRECOMPRESSED_FILE_EXTENSIONS = [('br', '.br'), ('gzip', '.gz')]
+
     def __init__(self, tenant, tenant_handler, logger):
         """Constructor
 
@@ -64,6 +130,11 @@ class QWC2Viewer:
         # internal QWC service URLs for internal usage
         self.internal_permalink_service_url = self.__sanitize_url(
             self.tenant_config.get('internal_permalink_service_url', 'http://qwc-permalink-service:9090'))
+        # connect and read timeouts in seconds for internal permalink service
+        self.internal_permalink_service_timeout = (
+            self.tenant_config.get('internal_permalink_service_connect_timeout', 3),
+            self.tenant_config.get('internal_permalink_service_read_timeout', 10)
+        )
 
         self.db_url = self.tenant_config.get('db_url', 'postgresql:///?service=qwc_configdb')
         self.qwc_config_schema = self.tenant_config.get('qwc_config_schema', 'qwc_config')
@@ -87,13 +158,147 @@ class QWC2Viewer:
             RuntimeConfig.config_file_path('mapViewer', tenant)
         )
 
-        # temporary target dir for any Base64 encoded thumbnail images
-        # NOTE: this dir will be cleaned up automatically on reload
-        self.images_temp_dir = None
+        # precompiled index.html, loaded on first request
+        self.index_template = None
+        # Content-Security-Policy header parts before and after the nonce
+        self.csp_header_parts = self.build_csp_header_parts()
+
+        # Base64 encoded thumbnail images by content addressed filename
+        self.base64_images = {}
+        # shared target dir for extracted Base64 encoded thumbnail images
+        # NOTE: the content addressed files are shared between tenants and
+        #       worker processes of the service user
+        self.thumbnail_cache_dir = self.tenant_config.get(
+            'thumbnail_cache_dir',
+            os.path.join(
+                tempfile.gettempdir(),
+                'qwc-map-viewer-thumbnails-%d' % os.getuid()
+            )
+        )
+        # storage for extracted thumbnail images ('disk' or 'memory')
+        self.thumbnail_storage = self.tenant_config.get(
+            'thumbnail_storage', 'disk'
+        )
+        if (
+            self.thumbnail_storage == 'disk'
+            and not self.prepare_thumbnail_cache_dir()
+        ):
+            self.logger.warning(
+                "Keeping thumbnail images in memory instead of in '%s'" %
+                self.thumbnail_cache_dir
+            )
+            self.thumbnail_storage = 'memory'
+        # cache for decoded thumbnail images by content addressed filename,
+        # if thumbnail_storage is 'memory'
+        self.thumbnail_memory_cache = LRUCache(
+            self.tenant_config.get('thumbnail_memory_cache_size', 500))
+        # optional resizing and transcoding of thumbnail images
+        self.thumbnail_transcoding = self.tenant_config.get(
+            'thumbnail_transcoding', False
+        )
+        if self.thumbnail_transcoding and Image is None:
+            self.logger.warning(
+                "Thumbnail transcoding is disabled, as the Pillow Python "
+                "module is not installed"
+            )
+            self.thumbnail_transcoding = False
+        self.thumbnail_size = self.tenant_config.get(
+            'thumbnail_size', [400, 200]
+        )
+        self.thumbnail_quality = self.tenant_config.get(
+            'thumbnail_quality', 80
+        )
+        self.thumbnail_formats = []
+        if self.thumbnail_transcoding:
+            self.thumbnail_formats = self.supported_thumbnail_formats(
+                self.tenant_config.get('thumbnail_formats', ['webp'])
+            )
+            # fingerprint of transcoding settings for thumbnail filenames
+            self.thumbnail_settings_digest = hashlib.sha256(json.dumps([
+                self.thumbnail_size, self.thumbnail_quality,
+                self.thumbnail_formats
+            ]).encode('utf-8')).hexdigest()[:16]
+        self.thumbnail_single_flight = SingleFlight()
 
         self.resources = self.load_resources(self.tenant_config)
         self.permissions_handler = PermissionsReader(tenant, logger)
 
+        # Cache-Control mode for themes.json, config.json and editConfig.json
+        self.json_cache_mode = self.tenant_config.get('json_cache_mode', 'no-store')
+        # compression of JSON responses above size threshold in bytes
+        self.json_compression = self.tenant_config.get('json_compression', False)
+        self.json_compression_min_size = self.tenant_config.get(
+            'json_compression_min_size', 1024)
+        # compression levels as {<endpoint>: {'gzip': <level>, 'br': <quality>}}
+        self.json_compression_levels = self.tenant_config.get(
+            'json_compression_levels', {})
+        # generation of config, permissions and viewer code for ETags
+        self.config_generation = self.build_config_generation()
+
+        # cache for filtered themes by permissions fingerprint and language
+        # NOTE: cache is discarded together with this handler if the config
+        #       or permissions are reloaded
+        self.themes_cache = LRUCache(
+            self.tenant_config.get('themes_cache_size', 100))
+
+        # coalesce concurrent computations of filtered themes and config
+        self.themes_single_flight = SingleFlight()
+        self.config_single_flight = SingleFlight()
+
+        # pooled HTTP session for requests to internal services
+        self.http_session = requests.Session()
+
+        # cache for themes of resolved permalinks by permalink key
+        # NOTE: permalink keys are immutable
+        self.permalink_cache = LRUCache(
+            self.PERMALINK_CACHE_SIZE,
+            self.tenant_config.get('permalink_cache_ttl', 3600)
+        )
+
+        # short-lived cache for user info fields from DB by username
+        # NOTE: entries are removed on updates via set_user_info
+        user_info_cache_ttl = self.tenant_config.get('user_info_cache_ttl', 30)
+        self.user_info_cache = LRUCache(
+            self.USER_INFO_CACHE_SIZE if user_info_cache_ttl > 0 else 0,
+            user_info_cache_ttl
+        )
+
+        # cache for compiled viewer_assets patterns by permissions fingerprint
+        self.viewer_assets_matcher_cache = LRUCache(
+            self.VIEWER_ASSETS_MATCHER_CACHE_SIZE)
+
+        # whether to serve precompressed .br/.gz siblings of static files
+        self.serve_precompressed_files = self.tenant_config.get(
+            'serve_precompressed_files', False)
+
+        # Cache-Control max-age in seconds for hashed and other dist/ files
+        self.dist_immutable_max_age = self.tenant_config.get(
+            'dist_immutable_max_age', 31536000)
+        self.dist_max_age = self.tenant_config.get('dist_max_age', 0)
+
+        # index of files in assets/, refreshed after asset_index_ttl seconds
+        self.asset_index_ttl = self.tenant_config.get('asset_index_ttl', 60)
+        self.asset_index = None
+        self.asset_index_single_flight = SingleFlight()
+        # held while an expired asset index is refreshed
+        self.asset_index_refresh_lock = threading.Lock()
+
+        # cache for translated designer forms by form path, translation
+        # file and their modification times
+        self.designer_form_cache = LRUCache(
+            self.tenant_config.get('designer_form_cache_size', 200))
+        self.prewarm_designer_forms(
+            self.tenant_config.get('designer_form_prewarm_languages', []))
+
+        metrics.register_caches(tenant, {
+            'themes': self.themes_cache,
+            'permalink': self.permalink_cache,
+            'user_info': self.user_info_cache,
+            'viewer_assets_matcher': self.viewer_assets_matcher_cache,
+            'designer_form': self.designer_form_cache,
+            'thumbnail_memory': self.thumbnail_memory_cache
+        })
+
     def qwc2_index(self, identity, params, request_url):
         """Return QWC2 index.html for user.
 
@@ -108,18 +313,7 @@ class QWC2Viewer:
             and not params.get('vp') \
             and isinstance(identity, dict) and self.db_url \
         :
-            db = db_engine.db_engine(self.db_url)
-            with db.connect() as conn:
-                sql = sql_text("""
-                    SELECT *
-                    FROM {schema}.user_infos ui
-                    JOIN {schema}.users u ON u.id=ui.user_id
-                    WHERE u.name=:user;
-                """.format(schema=self.qwc_config_schema))
-                result = conn.execute(sql, {"user": identity.get("username")})
-
-                row = result.first()
-                fields = row._asdict() if row else {}
+            fields = self.user_info(identity.get("username"))
             if fields.get("default_url_params", ""):
                 default_params = dict(parse_qsl(fields["default_url_params"]))
                 default_params.update(params)
@@ -146,9 +340,7 @@ class QWC2Viewer:
 
         # If there are no permitted themes, redirect to auth
         if self.redirect_to_auth_if_no_permitted_themes and self.auth_service_url:
-            permitted_theme_ids = []
-            themes = self.permitted_themes(identity, None, permitted_theme_ids)
-            if len(permitted_theme_ids) == 0:
+            if not self.any_theme_permitted(identity):
                 # redirect to login on auth service
                 login_params = urlencode({
                     'url': request_url
@@ -162,43 +354,87 @@ class QWC2Viewer:
                 return redirect(redirect_url)
 
         # check if index file is present
+        index_template = self.viewer_index_template()
+
+        nonce = secrets.token_urlsafe()
+        slots = {
+            '<head>': '<head>',
+            '<script ': '<script nonce="%s" ' % nonce,
+            '<script>': '<script nonce="%s">' % nonce,
+            '</head>': '<script nonce="%s">window.__CSP_NONCE__ = "%s";</script>\n</head>' % (nonce, nonce)
+        }
+
+        # Inject CSRF token
+        token = (get_jwt() or {}).get("csrf")
+        if token:
+            slots['<head>'] = '<head>\n<meta name="csrf-token" content="%s" />' % token
+
+        # Modify script tags
+        parts = list(index_template['parts'])
+        for idx in range(1, len(parts), 2):
+            parts[idx] = slots[parts[idx]]
+        viewer_index = "".join(parts)
+
+        # Inject CSP header
+        csp = nonce.join(self.csp_header_parts)
+
+        response = make_response(viewer_index)
+        response.headers['Content-Security-Policy'] = csp
+
+        return response
+
+    def viewer_index_template(self):
+        """Return precompiled index.html, reloaded if the file has changed.
+
+        Returns dict as:
+            {
+                mtime: <file modification time>,
+                parts: [<text>, <slot>, <text>, <slot>, ..., <text>]
+            }
+        """
         viewer_index_file = os.path.join(self.config_dir, 'index.html')
         try:
-            with open(viewer_index_file) as fh:
-                viewer_index = fh.read()
+            mtime = os.path.getmtime(viewer_index_file)
+            index_template = self.index_template
+            if index_template is None or index_template['mtime'] != mtime:
+                with open(viewer_index_file) as fh:
+                    viewer_index = fh.read()
+                self.logger.debug("Using index '%s'" % viewer_index_file)
+
+                # split at insertion points of CSRF token and CSP nonces
+                index_template = {
+                    'mtime': mtime,
+                    'parts': self.INDEX_TEMPLATE_SLOTS_RE.split(viewer_index)
+                }
+                self.index_template = index_template
         except:
             # show FileNotFoundError error
             raise Exception(
                 "[Errno 2] No such file or directory: '%s'" %
                 viewer_index_file
             )
-        self.logger.debug("Using index '%s'" % viewer_index_file)
 
-        # Inject CSRF token
-        token = (get_jwt() or {}).get("csrf")
-        if token:
-            viewer_index = viewer_index.replace('<head>', '<head>\n<meta name="csrf-token" content="%s" />' % token)
+        return index_template
 
-        # Inject CSP header and modify script tags
-        nonce = secrets.token_urlsafe()
+    def build_csp_header_parts(self):
+        """Return Content-Security-Policy header parts before and after the
+        nonce.
+        """
+        nonce_placeholder = '\0'
         csp = {
-            "script-src": "'nonce-%s' 'strict-dynamic' 'wasm-unsafe-eval'" % nonce,
+            "script-src": "'nonce-%s' 'strict-dynamic' 'wasm-unsafe-eval'" % nonce_placeholder,
             # "style-src 'nonce-%s'" % nonce # TODO
         }
         if self.extra_csp_directives:
             for extra_csp in filter(bool, self.extra_csp_directives.split(";")):
                 parts = extra_csp.strip().split(" ", 1)
+                if len(parts) < 2:
+                    # directive without value
+                    parts.append("")
                 csp[parts[0]] = (csp.get(parts[0], "") + " " + parts[1]).strip()
 
         csp = "; ".join(list(map(lambda t: " ".join(t), csp.items()))) + ";"
-        viewer_index = viewer_index.replace('<script ', '<script nonce="%s" ' % nonce)
-        viewer_index = viewer_index.replace('<script>', '<script nonce="%s">' % nonce)
-        viewer_index = viewer_index.replace('</head>', '<script nonce="%s">window.__CSP_NONCE__ = "%s";</script>\n</head>' % (nonce, nonce))
-
-        response = make_response(viewer_index)
-        response.headers['Content-Security-Policy'] = csp
-
-        return response
+        return csp.split(nonce_placeholder, 1)
 
     def qwc2_config(self, identity, params):
         """Return QWC2 config.json for user.
@@ -207,10 +443,66 @@ class QWC2Viewer:
         """
         self.logger.debug('Generating config.json for identity: %s', identity)
 
-        # deep copy config from qwc2_config
-        config = json.loads(json.dumps(
-            self.resources['qwc2_config']['config']
-        ))
+        etag = None
+        if self.json_cache_mode == 'revalidate':
+            user_info = None
+            if self.db_url and isinstance(identity, dict):
+                user_info = self.user_info(identity.get("username"))
+            etag = self.json_etag(
+                'config', self.permissions_fingerprint(identity), identity,
+                user_info, params.get("autologin") is not None,
+                os.environ.get('WMS_DPI')
+            )
+            if self.etag_matches(etag):
+                return self.not_modified_response(etag)
+
+        # share config between concurrent requests with the same inputs
+        config = self.config_single_flight.do(
+            self.config_key(identity, params),
+            lambda: self.build_config(identity, params)
+        )
+
+        return self.json_response('config', config, etag)
+
+    def config_key(self, identity, params):
+        """Return key of all inputs of build_config for identity.
+
+        NOTE: the user info fields from the DB are read by username
+
+        :param obj identity: User identity
+        :param obj params: Request parameters
+        """
+        identity_inputs = identity
+        if isinstance(identity, dict):
+            identity_inputs = [
+                identity.get('username'),
+                identity.get('auth_service_url'),
+                identity.get('autologin') is not None,
+                identity.get(self.display_user_info_field)
+                if self.display_user_info_field else None,
+                identity.get('user_infos')
+            ]
+
+        return json.dumps(
+            [
+                self.permissions_fingerprint(identity), identity_inputs,
+                params.get("autologin") is not None
+            ],
+            default=str, sort_keys=True
+        )
+
+    def build_config(self, identity, params):
+        """Return new QWC2 config for user.
+
+        :param obj identity: User identity
+        :param obj params: Request parameters
+        """
+        # copy config from qwc2_config
+        # NOTE: only modified entries are replaced, any nested config
+        #       is shared with the source config
+        config = dict(self.resources['qwc2_config']['config'])
+        plugins = dict(config['plugins'])
+        config['plugins'] = plugins
 
         # set QWC service URLs
         def set_service_url(key, tenant_config_key):
@@ -251,31 +543,20 @@ class QWC2Viewer:
 
                 if self.db_url:
                     # add custom user info fields
-                    db = db_engine.db_engine(self.db_url)
-                    with db.connect() as conn:
-                        sql = sql_text("""
-                            SELECT *
-                            FROM {schema}.user_infos ui
-                            JOIN {schema}.users u ON u.id=ui.user_id
-                            WHERE u.name=:user;
-                        """.format(schema=self.qwc_config_schema))
-                        result = conn.execute(sql, {"user": identity.get("username")})
-
-                        row = result.first()
-                        entries = row._asdict() if row else {}
-
-                        if self.display_user_info_field:
-                            display_username = entries[self.display_user_info_field]
-
-                        for field in self.user_info_fields:
-                            if field in entries:
-                                user_infos[field] = entries[field]
-                            else:
-                                self.logger.warning(
-                                    "Could not read user info field '%s' "
-                                    "from identity" % field
-                                )
-                        user_infos["default_url_params"] = entries.get("default_url_params", "")
+                    entries = self.user_info(identity.get("username"))
+
+                    if self.display_user_info_field:
+                        display_username = entries[self.display_user_info_field]
+
+                    for field in self.user_info_fields:
+                        if field in entries:
+                            user_infos[field] = entries[field]
+                        else:
+                            self.logger.warning(
+                                "Could not read user info field '%s' "
+                                "from identity" % field
+                            )
+                    user_infos["default_url_params"] = entries.get("default_url_params", "")
 
                 if isinstance(identity.get('user_infos'), dict):
                     user_infos.update(identity.get('user_infos'))
@@ -287,35 +568,36 @@ class QWC2Viewer:
         signed_in = username is not None
         hide_login = (autologin is not None) or (
             params.get("autologin") is not None)
-        if 'common' in config['plugins']:
-            self.__replace_login__helper_plugins(
-                config['plugins']['common'], signed_in, username, hide_login)
-        self.__replace_login__helper_plugins(
-            config['plugins']['mobile'], signed_in, username, hide_login)
-        self.__replace_login__helper_plugins(
-            config['plugins']['desktop'], signed_in, username, hide_login)
+        if 'common' in plugins:
+            plugins['common'] = self.__replace_login__helper_plugins(
+                plugins['common'], signed_in, username, hide_login)
+        plugins['mobile'] = self.__replace_login__helper_plugins(
+            plugins['mobile'], signed_in, username, hide_login)
+        plugins['desktop'] = self.__replace_login__helper_plugins(
+            plugins['desktop'], signed_in, username, hide_login)
 
         # filter any restricted viewer task items
         # NOTE: viewer tasks are always permitted by default
-        restricted_viewer_tasks = self.permissions_handler.resource_restrictions(
-            'viewer_tasks', identity
-        )
-        if 'common' in config['plugins']:
-            self.__filter_restricted_viewer_tasks(
-                config['plugins']['common'], restricted_viewer_tasks
+        with metrics.stage('permissions'):
+            restricted_viewer_tasks = self.permissions_handler.resource_restrictions(
+                'viewer_tasks', identity
             )
-        self.__filter_restricted_viewer_tasks(
-            config['plugins']['mobile'], restricted_viewer_tasks
+        if 'common' in plugins:
+            plugins['common'] = self.__filter_restricted_viewer_tasks(
+                plugins['common'], restricted_viewer_tasks
+            )
+        plugins['mobile'] = self.__filter_restricted_viewer_tasks(
+            plugins['mobile'], restricted_viewer_tasks
         )
-        self.__filter_restricted_viewer_tasks(
-            config['plugins']['desktop'], restricted_viewer_tasks
+        plugins['desktop'] = self.__filter_restricted_viewer_tasks(
+            plugins['desktop'], restricted_viewer_tasks
         )
 
         config['username'] = display_username or username
         config['tenant'] = self.tenant
         config['user_infos'] = user_infos
 
-        return jsonify(config)
+        return config
 
 
     def set_user_info(self, params, identity):
@@ -363,7 +645,7 @@ class QWC2Viewer:
         values["username"] = identity.get("username")
 
         db = db_engine.db_engine(self.db_url)
-        with db.begin() as conn:
+        with metrics.stage('db'), db.begin() as conn:
             sql = sql_text("""
                 WITH "user" AS (
                     SELECT id FROM "{schema}"."users" WHERE name=:username
@@ -379,15 +661,50 @@ class QWC2Viewer:
                 schema=self.qwc_config_schema
             ))
             result = conn.execute(sql, values)
+            self.count_db_round_trip()
             row = result.one_or_none()
             return_values = row._asdict() if row else None
 
+        # invalidate cached user info
+        self.user_info_cache.delete(values["username"])
+
         return jsonify({
             "success": return_values is not None,
             "fields": return_values,
             "error": "Query failed" if not return_values else None
         })
 
+    def user_info(self, username):
+        """Return user info fields of user from user_infos table in DB.
+
+        NOTE: results are cached for user_info_cache_ttl seconds
+
+        :param str username: User name
+        """
+        fields = self.user_info_cache.get(username)
+        if fields is None:
+            db = db_engine.db_engine(self.db_url)
+            with metrics.stage('db'), db.connect() as conn:
+                sql = sql_text("""
+                    SELECT *
+                    FROM {schema}.user_infos ui
+                    JOIN {schema}.users u ON u.id=ui.user_id
+                    WHERE u.name=:user;
+                """.format(schema=self.qwc_config_schema))
+                result = conn.execute(sql, {"user": username})
+                self.count_db_round_trip()
+
+                row = result.first()
+                fields = row._asdict() if row else {}
+
+            self.user_info_cache.set(username, fields)
+
+        return fields
+
+    def count_db_round_trip(self):
+        """Count DB round trip of current request."""
+        g.db_round_trips = g.get('db_round_trips', 0) + 1
+
     def __sanitize_url(self, url):
         """Ensure URL ends with a slash, if not empty
         """
@@ -401,15 +718,21 @@ class QWC2Viewer:
         """
         theme = params.get('t')
 
-        if params.get('k') or not self.internal_permalink_service_url:
+        if not params.get('k') or not self.internal_permalink_service_url:
             # no permalink param present or no permalink service configured
             return theme
 
+        key = params['k']
+        cached = self.permalink_cache.get(key)
+        if cached is not None:
+            # use cached permalink theme
+            return cached['theme'] or theme
+
         # resolve permalink and extract theme
         try:
             # resolve permalink
             url = urljoin(self.internal_permalink_service_url, 'resolvepermalink')
-            params = {'key': params['k']}
+            params = {'key': key}
             self.logger.debug(
                 "Resolving permalink at %s?%s" % (url, urlencode(params))
             )
@@ -418,11 +741,16 @@ class QWC2Viewer:
                 # forward tenant header
                 headers[self.tenant_handler.tenant_header] = self.tenant
                 self.logger.debug("Forwarding tenant header: %s" % headers)
-            response = requests.get(url, params=params, headers=headers)
+            response = self.http_session.get(
+                url, params=params, headers=headers,
+                timeout=self.internal_permalink_service_timeout
+            )
+            response.raise_for_status()
 
             # extract theme
             permalink = json.loads(response.text)
             permalink_theme = permalink.get('query', {}).get('t')
+            self.permalink_cache.set(key, {'theme': permalink_theme})
             if permalink_theme:
                 self.logger.debug(
                     "Permalink contains theme '%s'" % permalink_theme
@@ -453,120 +781,163 @@ class QWC2Viewer:
             return False
 
         # check whether theme exists
-        available_theme_ids = self.__collect_theme_ids(self.resources['qwc2_themes'])
-        if theme not in available_theme_ids:
+        items = self.resources['theme_items'].get(theme)
+        if not items:
             # unknown theme ID
             return False
 
         # check whether theme is not public
-        public_theme_ids = self.__collect_theme_ids(self.permitted_themes(None, None))
-        return theme not in public_theme_ids
+        # NOTE: placeholders for restricted themes count as public
+        permitted_wms_names = self.permitted_wms_names(None)
+        return not any(
+            permitted_wms_names.get(item['wms_name'])
+            or self.show_restricted_item(item)
+            for item in items
+        )
 
-    def __collect_theme_ids(self, theme_group):
-        """Recursively collect theme IDs from config or permissions.
+    def permitted_wms_names(self, identity):
+        """Return lookup for permitted WMS names of identity.
 
-        :param obj theme_group: Theme group from config or permissions
+        :param obj identity: User identity
         """
-        theme_ids = []
+        permitted_wms_names = {}
+        for permission in self.permissions_handler.resource_permissions(
+            'wms_services', identity
+        ):
+            if isinstance(permission, dict):
+                permitted_wms_names[permission.get('name')] = True
+            else:
+                permitted_wms_names[permission] = True
 
-        # collect theme items
-        for item in theme_group.get('items', []):
-            theme_ids.append(item['id'])
+        return permitted_wms_names
 
-        # collect sub groups
-        for subgroup in theme_group.get('subdirs', []):
-            theme_ids += self.__collect_theme_ids(subgroup)
+    def any_theme_permitted(self, identity):
+        """Return whether any theme is permitted for identity.
 
-        return theme_ids
+        :param obj identity: User identity
+        """
+        permitted_wms_names = self.permitted_wms_names(identity)
+        return any(
+            wms_name in permitted_wms_names
+            for wms_name in self.resources['theme_wms_names']
+        )
 
     def __replace_login__helper_plugins(self, plugins, signed_in, username, hide):
         """Search plugins configurations and call
-           self.__replace_login__helper_items on menuItems and toolbarItems
+           self.__replace_login__helper_items on menuItems and toolbarItems.
+
+        Return new list of plugins configurations, unmodified plugins are
+        shared with the source list.
 
         :param list(obj) plugins: Plugins configurations
         :param bool signed_in: Whether user is signed in
         """
+        result = []
         for plugin in plugins:
-            if 'cfg' not in plugin:
-                # skip plugin without cfg
-                continue
-            if "menuItems" in plugin["cfg"]:
-                self.__replace_login__helper_items(
-                    plugin["cfg"]["menuItems"], signed_in, username, hide)
-            if "toolbarItems" in plugin["cfg"]:
-                self.__replace_login__helper_items(
-                    plugin["cfg"]["toolbarItems"], signed_in, username, hide)
+            cfg = plugin.get('cfg')
+            if cfg is not None and ("menuItems" in cfg or "toolbarItems" in cfg):
+                cfg = dict(cfg)
+                if "menuItems" in cfg:
+                    cfg["menuItems"] = self.__replace_login__helper_items(
+                        cfg["menuItems"], signed_in, username, hide)
+                if "toolbarItems" in cfg:
+                    cfg["toolbarItems"] = self.__replace_login__helper_items(
+                        cfg["toolbarItems"], signed_in, username, hide)
+                plugin = dict(plugin, cfg=cfg)
+            result.append(plugin)
+
+        return result
 
     def __replace_login__helper_items(self, items, signed_in, username, hide):
         """Replace Login with Logout if identity is not None on Login items in
            menuItems and toolbarItems.
 
+        Return new list of items, unmodified items are shared with the source
+        list.
+
         :param list(obj) items: Menu or toolbar items
         :param bool signed_in: Whether user is signed in
         """
-        removeIndex = None
+        result = []
         for (idx, item) in enumerate(items):
             # Convert legacy name
             if item.get("key") == "Login":
-                item["key"] = "Authentication"
-                item["mode"] = "Login"
+                item = dict(item, key="Authentication", mode="Login")
             if item.get("key") == "Authentication" and signed_in:
                 if hide:
-                    removeIndex = idx
+                    # skip item and keep any remaining items
+                    result += items[idx + 1:]
                     break
                 else:
-                    item["mode"] = "Logout"
-                    item["icon"] = "logout"
-                    item["trargs"] = [username]
+                    item = dict(
+                        item, mode="Logout", icon="logout", trargs=[username]
+                    )
             elif "subitems" in item:
-                self.__replace_login__helper_items(
-                    item["subitems"], signed_in, username, hide)
-        if removeIndex is not None:
-            del items[removeIndex]
+                item = dict(item, subitems=self.__replace_login__helper_items(
+                    item["subitems"], signed_in, username, hide))
+            result.append(item)
+
+        return result
 
     def __filter_restricted_viewer_tasks(self, plugins,
                                          restricted_viewer_tasks):
         """Remove restricted viewer task items from menu and toolbar.
 
+        Return new list of plugins configurations, unmodified plugins are
+        shared with the source list.
+
         :param list(obj) plugins: Plugins configurations
         :param obj restricted_viewer_tasks: Restricted viewer tasks
         """
         for key in restricted_viewer_tasks:
-            plugins_to_remove = []
+            permitted_plugins = []
             for plugin in plugins:
+                cfg = plugin.get("cfg", {})
                 if plugin.get("name") == key:
-                    plugins_to_remove.append(plugin)
+                    # skip restricted plugin
+                    continue
                 elif plugin.get("name") == "TaskButton" and \
-                    plugin.get("cfg", {}).get("task", "") + plugin.get("cfg").get('mode', "") == key:
-                    plugins_to_remove.append(plugin)
-                else:
-                    if 'menuItems' in plugin.get('cfg', {}):
-                        self.__filter_config_items(
-                            plugin['cfg']['menuItems'], key
+                    cfg.get("task", "") + cfg.get('mode', "") == key:
+                    # skip restricted task button
+                    continue
+                elif 'menuItems' in cfg or 'toolbarItems' in cfg:
+                    cfg = dict(cfg)
+                    if 'menuItems' in cfg:
+                        cfg['menuItems'] = self.__filter_config_items(
+                            cfg['menuItems'], key
                         )
-                    if 'toolbarItems' in plugin.get('cfg', {}):
-                        self.__filter_config_items(
-                            plugin['cfg']['toolbarItems'], key
+                    if 'toolbarItems' in cfg:
+                        cfg['toolbarItems'] = self.__filter_config_items(
+                            cfg['toolbarItems'], key
                         )
-            for plugin in plugins_to_remove:
-                plugins.remove(plugin)
+                    plugin = dict(plugin, cfg=cfg)
+                permitted_plugins.append(plugin)
+            plugins = permitted_plugins
+
+        return plugins
 
     def __filter_config_items(self, items, key):
         """Remove items with key from menuItems and toolbarItems.
 
+        Return new list of items, unmodified items are shared with the source
+        list.
+
         :param list(obj) items: Menu or toolbar items
         :param str key: Item key
         """
-        items_to_remove = []
+        permitted_items = []
         for item in items:
             if item['key'] + item.get('mode', '') == key:
-                # collect items to remove
-                items_to_remove.append(item)
+                # skip restricted item
+                continue
             elif 'subitems' in item:
-                self.__filter_config_items(item['subitems'], key)
+                item = dict(
+                    item,
+                    subitems=self.__filter_config_items(item['subitems'], key)
+                )
+            permitted_items.append(item)
 
-        for item in items_to_remove:
-            items.remove(item)
+        return permitted_items
 
     def qwc2_themes(self, identity, lang):
         """Return QWC2 themes.json for user.
@@ -576,10 +947,21 @@ class QWC2Viewer:
         """
         self.logger.debug('Getting themes.json for identity: %s', identity)
 
+        etag = None
+        if self.json_cache_mode == 'revalidate':
+            etag = self.json_etag(
+                'themes', self.permissions_fingerprint(identity), lang,
+                url_for('editConfig')
+            )
+            if self.etag_matches(etag):
+                return self.not_modified_response(etag)
+
         # filter by permissions
-        themes = self.permitted_themes(identity, lang)
+        cached = self.permitted_themes_entry(identity, lang)
 
-        return jsonify({"themes": themes})
+        return self.json_response(
+            'themes', {"themes": cached['themes']}, etag, cached
+        )
 
     def edit_config(self, identity, wms_name, layers):
         if layers is not None:
@@ -587,47 +969,223 @@ class QWC2Viewer:
         else:
             self.logger.debug('Getting all %s editConfigs for identity: %s', wms_name, identity)
 
-        # filter by permissions
-        themes = json.loads(json.dumps(self.resources['qwc2_themes']))
-        editConfig = self.__search_edit_config(themes, wms_name, layers, identity)
+        etag = None
+        if self.json_cache_mode == 'revalidate':
+            etag = self.json_etag(
+                'editConfig', self.permissions_fingerprint(identity), wms_name,
+                layers
+            )
+            if self.etag_matches(etag):
+                return self.not_modified_response(etag)
+
+        editConfig = {}
+
+        # lookup theme items with edit configs for WMS
+        edit_config_items = self.resources['edit_config_items'].get(wms_name, [])
+        with metrics.stage('filter_edit_config'):
+            if edit_config_items and self.permissions_handler.resource_permissions(
+                'wms_services', identity, wms_name
+            ):
+                # filter by permissions
+                for entry in edit_config_items:
+                    if layers is None:
+                        editConfig = self.filter_edit_config(entry['item'], identity)
+                    else:
+                        editConfig = self.filter_layers_edit_config(
+                            entry, layers, identity
+                        )
+                    if editConfig:
+                        break
+
+        return self.json_response('editConfig', editConfig, etag)
+
+    def build_config_generation(self):
+        """Return identifier for the current generation of config,
+        permissions and viewer code.
+
+        NOTE: the handler is recreated if the config or permissions change
+        """
+        last_config_update = self.tenant_handler.last_config_update(
+            'mapViewer', self.tenant
+        )
+        # env var overrides of config options in config file
+        config_overrides = {
+            key: os.environ.get(key.upper())
+            for key in self.tenant_config.config.get('config', {})
+            if key.upper() in os.environ
+        }
+        return [
+            last_config_update.isoformat() if last_config_update else None,
+            os.path.getmtime(__file__),
+            config_overrides
+        ]
+
+    def json_etag(self, *parts):
+        """Return strong ETag for a JSON response, derived from the config
+        generation and all request specific inputs of the response.
+
+        :param list parts: Request specific inputs
+        """
+        key = json.dumps(
+            [self.tenant, self.config_generation, parts],
+            default=str, sort_keys=True
+        )
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def etag_matches(self, etag):
+        """Check if If-None-Match of request matches ETag of any
+        representation of a JSON response.
+
+        :param str etag: ETag of uncompressed JSON response
+        """
+        return any(
+            request.if_none_match.contains(representation_etag)
+            for representation_etag in self.representation_etags(etag)
+        )
+
+    def representation_etags(self, etag):
+        """Return ETags of uncompressed and compressed representations of a
+        JSON response.
+
+        :param str etag: ETag of uncompressed JSON response
+        """
+        etags = [etag]
+        if self.json_compression:
+            etags += [
+                "%s-%s" % (etag, encoding)
+                for encoding in self.json_compression_encodings()
+            ]
+        return etags
+
+    def not_modified_response(self, etag):
+        """Return empty 304 Not Modified response.
+
+        :param str etag: ETag of uncompressed JSON response
+        """
+        response = make_response('', 304)
+        # return matching ETag of representation
+        response.set_etag(next(
+            (
+                representation_etag
+                for representation_etag in self.representation_etags(etag)
+                if request.if_none_match.contains(representation_etag)
+            ),
+            etag
+        ))
+        if self.json_compression:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def json_response(self, endpoint, data, etag=None, cached=None):
+        """Return JSON response, compressed if enabled, above the size
+        threshold and accepted by the client.
 
-        return jsonify(editConfig or {})
+        :param str endpoint: Endpoint name for compression level lookup
+        :param obj data: JSON data
+        :param str etag: Optional ETag of uncompressed JSON response
+        :param obj cached: Optional cache entry for storing serialized and
+                           compressed JSON
+        """
+        if cached is not None and 'json' in cached:
+            body = cached['json']
+        else:
+            with metrics.stage('serialize'):
+                body = jsonify(data).get_data()
+            if cached is not None:
+                cached['json'] = body
+
+        encoding = None
+        if self.json_compression:
+            if len(body) >= self.json_compression_min_size:
+                encoding = request.accept_encodings.best_match(
+                    self.json_compression_encodings()
+                )
+
+        if encoding is not None:
+            compressed = None
+            if cached is not None:
+                compressed = cached.get('compressed', {}).get(encoding)
+            if compressed is None:
+                with metrics.stage('compress'):
+                    compressed = self.compress(body, encoding, endpoint)
+                if cached is not None:
+                    # NOTE: replace dict to avoid concurrent modification
+                    cached['compressed'] = dict(
+                        cached.get('compressed', {}), **{encoding: compressed}
+                    )
+            body = compressed
+
+        response = Response(body, mimetype='application/json')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if self.json_compression:
+            response.vary.add('Accept-Encoding')
+        if etag is not None:
+            if encoding is not None:
+                etag = "%s-%s" % (etag, encoding)
+            response.set_etag(etag)
+
+        return response
+
+    def json_compression_encodings(self):
+        """Return supported content encodings for JSON responses in order of
+        preference.
+        """
+        if brotli is not None:
+            return ['br', 'gzip']
+        else:
+            return ['gzip']
+
+    def compress(self, body, encoding, endpoint):
+        """Return compressed response body.
+
+        :param bytes body: Response body
+        :param str encoding: Content encoding 'br' or 'gzip'
+        :param str endpoint: Endpoint name for compression level lookup
+        """
+        levels = self.json_compression_levels.get(endpoint, {})
+        if encoding == 'br':
+            return brotli.compress(body, quality=levels.get('br', 4))
+        else:
+            return gzip.compress(body, compresslevel=levels.get('gzip', 6))
+
+    def filter_layers_edit_config(self, entry, layers, identity):
+        """Return new edit config for layers and any recursively referenced
+        reltables filtered by permissions.
+
+        NOTE: only the collected datasets are filtered by permissions, and
+              reltables of restricted datasets are not followed
 
-    def __search_edit_config(self, themes, wms_name, layers, identity):
-        for item in themes.get('items', []):
-            wms_permissions = self.permissions_handler.resource_permissions(
-                'wms_services', identity, item['wms_name']
+        :param obj entry: Edit config entry of theme item from
+                          edit_config_items
+        :param list layers: Layer names
+        :param obj identity: User identity
+        """
+        item = entry['item']
+        fullEditConfig = item['editConfig']
+        reltables = entry['reltables']
+
+        editConfig = {}
+        visited = set()
+        pending = list(layers)
+        while pending:
+            # recursively collect referenced editConfigs
+            name = pending.pop(0)
+            if name in visited:
+                continue
+            visited.add(name)
+
+            if name not in fullEditConfig:
+                # missing edit config
+                continue
+            config = self.permitted_edit_dataset(
+                item, name, fullEditConfig[name], identity
             )
-            if wms_permissions and item['wms_name'] == wms_name:
-                self.filter_edit_config(item, identity)
-                fullEditConfig = item.get('editConfig', {})
-                if layers is None:
-                    return fullEditConfig
-                editConfig = dict([
-                    (layer, fullEditConfig[layer]) for layer in layers if layer in fullEditConfig
-                ])
-                missingconfigs = []
-                while True:
-                    # Recursively collect referenced editConfigs
-                    reltables = []
-                    for config in editConfig.values():
-                        getLayerName = lambda entry: entry['layerName'] if isinstance(entry, dict) else entry
-                        reltablenames = [getLayerName(entry) for entry in config.get('reltables', [])]
-                        reltables += [table for table in reltablenames if table not in editConfig and table not in missingconfigs]
-                    if not reltables:
-                        break
-                    for table in reltables:
-                        if table in fullEditConfig:
-                            editConfig[table] = fullEditConfig[table]
-                        else:
-                            missingconfigs.append(table)
-                return editConfig
+            if config:
+                editConfig[name] = config
+                pending += reltables.get(name, [])
 
-        for subdir in themes.get('subdirs', []):
-            editConfig = self.__search_edit_config(subdir, wms_name, layers, identity)
-            if editConfig:
-                return editConfig
-        return None
+        return editConfig
 
     def qwc2_assets(self, path, identity, lang):
         """Return QWC2 asset from assets/ or temporary image dir.
@@ -635,17 +1193,9 @@ class QWC2Viewer:
         :param str path: Asset path
         :param str lang: Asset language
         """
-        restricted_viewer_assets = self.permissions_handler.resource_restrictions(
-            'viewer_assets', identity
-        )
-        permitted_viewer_assets = self.permissions_handler.resource_permissions(
-            'viewer_assets', identity
-        )
-
-        path_is_restricted = next((x for x in restricted_viewer_assets if fnmatch.fnmatch(path, x)), None)
-        path_is_permitted = next((x for x in permitted_viewer_assets if fnmatch.fnmatch(path, x)), None)
-
-        if path_is_restricted and not path_is_permitted:
+        with metrics.stage('permissions'):
+            path_permitted = self.viewer_asset_permitted(path, identity)
+        if not path_permitted:
             self.logger.debug("Asset %s is not permitted, returning 404" % path)
             return abort(404)
 
@@ -657,54 +1207,336 @@ class QWC2Viewer:
 
             # Check if localized asset exists
             if lang:
-                full_dir = os.path.dirname(os.path.join(self.qwc2_path, 'assets', path))
                 basename, ext = os.path.splitext(os.path.basename(path))
-                localized_file = os.path.join(basename + "_{lang}" + ext)
-                if os.path.isfile(os.path.join(full_dir, localized_file.format(lang=lang))):
+                localized_path = os.path.join(os.path.dirname(path), basename + "_{lang}" + ext)
+                if self.asset_exists(localized_path.format(lang=lang)):
                     # Full locale (i.e. en-US)
-                    path = os.path.join(os.path.dirname(path), localized_file.format(lang=lang))
-                elif os.path.isfile(os.path.join(full_dir, localized_file.format(lang=lang[0:2]))):
+                    path = localized_path.format(lang=lang)
+                elif self.asset_exists(localized_path.format(lang=lang[0:2])):
                     # Lang only (i.e. en)
-                    path = os.path.join(os.path.dirname(path), localized_file.format(lang=lang[0:2]))
+                    path = localized_path.format(lang=lang[0:2])
 
             # send file from assets/
-            return send_from_directory(
+            return self.send_static_file(
                 os.path.join(self.qwc2_path, 'assets'), path
             )
         else:
-            if self.images_temp_dir is not None:
-                # send extracted Base64 encoded image (remove prefix)
-                return send_from_directory(
-                    self.images_temp_dir.name,
-                    path[len(self.BASE64_IMAGE_ROUTE_PREFIX):]
+            # send extracted Base64 encoded image (remove prefix)
+            return self.send_base64_image(
+                path[len(self.BASE64_IMAGE_ROUTE_PREFIX):]
+            )
+
+    def send_base64_image(self, path):
+        """Send Base64 encoded thumbnail image, extracted on first request.
+
+        :param str path: Image path, e.g. 'mapthumbs/<hash>.png'
+        """
+        dirname, filename = os.path.split(path)
+        thumbnail_base64 = None
+        if dirname == 'mapthumbs':
+            thumbnail_base64 = self.base64_images.get(filename)
+        if thumbnail_base64 is None:
+            return abort(404)
+
+        # select image format accepted by client
+        image_format = 'png'
+        if self.thumbnail_transcoding:
+            image_format = self.thumbnail_variant_format()
+        _, mimetype, extension = self.THUMBNAIL_FORMATS[image_format]
+        stem = os.path.splitext(filename)[0]
+
+        if self.thumbnail_storage == 'memory':
+            # decode into memory, without any file system access
+            variants = self.thumbnail_memory_cache.get(filename)
+            if variants is None:
+                variants = self.thumbnail_single_flight.do(
+                    filename,
+                    lambda: self.thumbnail_variants(filename, thumbnail_base64)
+                )
+                if variants is None:
+                    return self.send_default_thumbnail()
+                self.thumbnail_memory_cache.set(filename, variants)
+
+            response = Response(variants[image_format], mimetype=mimetype)
+            # content addressed filename of variant as strong ETag
+            response.set_etag(stem + extension)
+            response = response.make_conditional(request)
+        else:
+            # extract to file in thumbnail cache dir, if not present
+            variant_filename = stem + extension
+            variant_path = os.path.join(
+                self.thumbnail_cache_dir, variant_filename
+            )
+            if not os.path.isfile(variant_path):
+                extracted = self.thumbnail_single_flight.do(
+                    filename,
+                    lambda: self.extract_thumbnail_files(
+                        filename, thumbnail_base64
+                    )
                 )
-            else:
-                # temp dir not present
-                return abort(404)
+                if not extracted:
+                    return self.send_default_thumbnail()
+
+            response = send_from_directory(
+                self.thumbnail_cache_dir, variant_filename, mimetype=mimetype
+            )
+
+        if self.thumbnail_transcoding:
+            response.vary.add('Accept')
+        return self.with_thumbnail_cache_headers(response)
+
+    def send_default_thumbnail(self):
+        """Send default thumbnail image, e.g. on error on extract."""
+        return send_from_directory(
+            os.path.join(self.qwc2_path, 'assets'),
+            self.DEFAULT_THUMBNAIL_IMAGE
+        )
+
+    def thumbnail_variant_format(self):
+        """Return preferred transcoded thumbnail format accepted by the
+        client, or 'png'.
+        """
+        accepted = [
+            mimetype for mimetype, quality in request.accept_mimetypes
+            if quality > 0
+        ]
+        for image_format in self.thumbnail_formats:
+            if self.THUMBNAIL_FORMATS[image_format][1] in accepted:
+                return image_format
+        return 'png'
+
+    def with_thumbnail_cache_headers(self, response):
+        """Add cache headers for content addressed thumbnail image to
+        response.
+
+        :param obj response: Response
+        """
+        # content addressed image will never change
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = self.THUMBNAIL_MAX_AGE
+        response.cache_control.immutable = True
+        return response
+
+    def viewer_asset_permitted(self, path, identity):
+        """Check if asset path is not restricted by viewer_assets
+        permissions.
+
+        :param str path: Asset path
+        :param obj identity: User identity
+        """
+        matcher = self.viewer_assets_matcher(identity)
+        path = os.path.normcase(path)
+
+        path_is_restricted = matcher['restricted'] is not None and \
+            matcher['restricted'].match(path) is not None
+        if not path_is_restricted:
+            return True
+
+        return matcher['permitted'] is not None and \
+            matcher['permitted'].match(path) is not None
+
+    def viewer_assets_matcher(self, identity):
+        """Return cached compiled patterns of restricted and permitted
+        viewer_assets for identity.
+
+        Returns dict as:
+            {
+                restricted: <compiled regex or None>,
+                permitted: <compiled regex or None>
+            }
+
+        :param obj identity: User identity
+        """
+        fingerprint = self.permissions_fingerprint(identity)
+        matcher = self.viewer_assets_matcher_cache.get(fingerprint)
+        if matcher is None:
+            matcher = {
+                'restricted': self.compile_glob_patterns(
+                    self.permissions_handler.resource_restrictions(
+                        'viewer_assets', identity
+                    )
+                ),
+                'permitted': self.compile_glob_patterns(
+                    self.permissions_handler.resource_permissions(
+                        'viewer_assets', identity
+                    )
+                )
+            }
+            self.viewer_assets_matcher_cache.set(fingerprint, matcher)
+
+        return matcher
+
+    def compile_glob_patterns(self, patterns):
+        """Return single compiled regex matching any of the glob patterns,
+        or None if there are no patterns.
+
+        :param list(str) patterns: fnmatch glob patterns
+        """
+        patterns = sorted(set(filter(bool, patterns)))
+        if not patterns:
+            return None
+
+        return re.compile("|".join(
+            "(?:%s)" % fnmatch.translate(os.path.normcase(pattern))
+            for pattern in patterns
+        ))
+
+    def asset_exists(self, path):
+        """Check if a file is present in assets/.
+
+        :param str path: Asset path relative to assets/
+        """
+        if self.asset_index_ttl <= 0:
+            # asset index disabled
+            return os.path.isfile(os.path.join(self.qwc2_path, 'assets', path))
+
+        asset_index = self.asset_index
+        if asset_index is None:
+            # build initial index once for all concurrent requests
+            asset_index = self.asset_index_single_flight.do(
+                'asset_index',
+                lambda: self.asset_index or self.build_asset_index()
+            )
+        elif (
+            time.monotonic() >= asset_index['expires']
+            and self.asset_index_refresh_lock.acquire(blocking=False)
+        ):
+            # refresh expired index in the background and use the stale
+            # index meanwhile
+            threading.Thread(
+                target=self.refresh_asset_index, daemon=True
+            ).start()
+
+        return os.path.normpath(path) in asset_index['files']
+
+    def build_asset_index(self):
+        """Index files in assets/ and return the new asset index."""
+        asset_index = {
+            'files': self.collect_asset_files(),
+            'expires': time.monotonic() + self.asset_index_ttl
+        }
+        self.asset_index = asset_index
+        return asset_index
+
+    def refresh_asset_index(self):
+        """Rebuild expired asset index and release the refresh lock."""
+        try:
+            self.build_asset_index()
+        except Exception as e:
+            # keep stale index and retry on next request
+            self.logger.error("Could not refresh asset index: %s" % e)
+        finally:
+            self.asset_index_refresh_lock.release()
+
+    def collect_asset_files(self):
+        """Return set of paths of all files in assets/, relative to assets/."""
+        assets_path = os.path.join(self.qwc2_path, 'assets')
+        asset_files = set()
+        for root, dirs, files in os.walk(assets_path, followlinks=True):
+            rel_root = os.path.relpath(root, assets_path)
+            for filename in files:
+                asset_files.add(os.path.normpath(os.path.join(rel_root, filename)))
+
+        self.logger.debug("Indexed %d files in %s" % (len(asset_files), assets_path))
+        return asset_files
 
     def qwc2_data(self, path):
         """Return data from data/.
 
         :param str path: Data path
         """
-        return send_from_directory(os.path.join(self.qwc2_path, 'data'), path)
+        return self.send_static_file(os.path.join(self.qwc2_path, 'data'), path)
 
     def qwc2_js(self, path):
         """Return QWC2 Javascript from dist/.
 
         :param str path: Asset path
         """
-        return send_from_directory(os.path.join(self.qwc2_path, 'dist'), path)
+        response = self.send_static_file(
+            os.path.join(self.qwc2_path, 'dist'), path
+        )
+        if response.status_code not in (200, 304):
+            return response
+
+        if self.dist_immutable_max_age > 0 and self.dist_file_hashed(path):
+            # content hashed bundle will never change
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.dist_immutable_max_age
+            response.cache_control.immutable = True
+        elif self.dist_max_age > 0:
+            # cache entry points only shortly, revalidate using ETag
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.dist_max_age
+
+        return response
+
+    def dist_file_hashed(self, path):
+        """Check if dist/ file is addressed by its content hash, either in
+        its filename or in the query string.
+
+        :param str path: Asset path
+        """
+        return (
+            self.HASHED_FILENAME_RE.search(path) is not None
+            or self.HASHED_QUERY_RE.match(
+                request.query_string.decode('utf-8', 'replace')
+            ) is not None
+        )
 
     def qwc2_translations(self, path):
         """Return QWC2 translation file from translations/.
 
         :param str path: Asset path
         """
-        return send_from_directory(
+        return self.send_static_file(
             os.path.join(self.qwc2_path, 'translations'), path
         )
 
+    def send_static_file(self, directory, path):
+        """Send static file, or its precompressed .br/.gz sibling if enabled
+        and accepted by the client.
+
+        :param str directory: Base directory
+        :param str path: File path relative to base directory
+        """
+        if not self.serve_precompressed_files:
+            return send_from_directory(directory, path)
+
+        file_path = safe_join(directory, path)
+        if file_path is not None:
+            for encoding, ext in self.PRECOMPRESSED_FILE_EXTENSIONS:
+                if not request.accept_encodings[encoding]:
+                    continue
+                if not self.precompressed_file_current(file_path, file_path + ext):
+                    continue
+
+                mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+                response = send_from_directory(
+                    directory, path + ext, mimetype=mimetype
+                )
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+
+        response = send_from_directory(directory, path)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def precompressed_file_current(self, file_path, compressed_path):
+        """Check if precompressed file is present and not older than its
+        source file.
+
+        :param str file_path: Source file path
+        :param str compressed_path: Precompressed file path
+        """
+        try:
+            return os.path.getmtime(compressed_path) >= os.path.getmtime(file_path)
+        except OSError:
+            return False
+
     def qwc2_favicon(self):
         """Return default favicon."""
         return send_from_directory(self.qwc2_path, 'favicon.ico')
@@ -726,14 +1558,137 @@ class QWC2Viewer:
         self.extract_base64_theme_item_thumbnail_images(qwc2_themes)
         self.extract_base64_background_layer_thumbnail_images(qwc2_themes)
 
+        # lookup for theme items by theme ID
+        theme_items = {}
+        self.collect_theme_items(qwc2_themes, theme_items)
+        all_theme_items = []
+        for theme_id, items in theme_items.items():
+            if len(items) > 1:
+                self.logger.warning(
+                    "Duplicate theme ID '%s' in %d theme items" %
+                    (theme_id, len(items))
+                )
+            all_theme_items += items
+
+        # unique WMS names of all theme items
+        theme_wms_names = list(dict.fromkeys([
+            item['wms_name'] for item in all_theme_items
+        ]))
+
+        # precompile layer trees of theme items
+        # NOTE: lookup by theme item object, as theme IDs may be duplicate
+        theme_layer_indexes = {}
+        for item in all_theme_items:
+            theme_layer_indexes[id(item)] = self.build_layer_index(item)
+
+        # lookup for theme items with edit configs by WMS name
+        edit_config_items = {}
+        for item in all_theme_items:
+            if item.get('editConfig'):
+                edit_config_items.setdefault(item['wms_name'], []).append(
+                    self.build_edit_config_entry(item)
+                )
+
         return {
             'qwc2_config': qwc2_config,
-            'qwc2_themes': qwc2_themes
+            'qwc2_themes': qwc2_themes,
+            'theme_items': theme_items,
+            'theme_wms_names': theme_wms_names,
+            'theme_layer_indexes': theme_layer_indexes,
+            'edit_config_items': edit_config_items
+        }
+
+    def collect_theme_items(self, theme_group, theme_items):
+        """Recursively collect theme items by theme ID.
+
+        :param obj theme_group: Theme group
+        :param obj theme_items: Lookup for lists of theme items
+        """
+        for item in theme_group.get('items', []):
+            theme_items.setdefault(item['id'], []).append(item)
+
+        for subgroup in theme_group.get('subdirs', []):
+            self.collect_theme_items(subgroup, theme_items)
+
+    def build_edit_config_entry(self, item):
+        """Return edit config entry of theme item with referenced reltables.
+
+        Returns dict as:
+            {
+                item: <theme item>,
+                reltables: {
+                    <layer>: [<reltable layer>]
+                }
+            }
+
+        :param obj item: Theme item
+        """
+        getLayerName = lambda entry: entry['layerName'] if isinstance(entry, dict) else entry
+
+        reltables = {}
+        for name, config in item['editConfig'].items():
+            reltables[name] = [
+                getLayerName(entry) for entry in config.get('reltables', [])
+            ]
+
+        return {
+            'item': item,
+            'reltables': reltables
+        }
+
+    def build_layer_index(self, item):
+        """Return layer index of theme item for filtering by permissions.
+
+        Returns lookup dict as:
+            {
+                layers: [(<layer>, <parent index or -1>, <is group>)],
+                visibility_presets: {
+                    <preset>: [(<key>, <value>, <layer name>)]
+                },
+                filter_searchterms: <whether to filter layer searchterms>
+            }
+
+        :param obj item: Theme item
+        """
+        # flatten layer tree in depth-first order, so that parents are always
+        # listed before their sub layers
+        layers = []
+
+        def collect_layers(layer, parent_idx):
+            for sublayer in layer.get('sublayers') or []:
+                is_group = bool(sublayer.get('sublayers'))
+                layers.append((sublayer, parent_idx, is_group))
+                if is_group:
+                    collect_layers(sublayer, len(layers) - 1)
+
+        collect_layers(item, -1)
+
+        # split visibility preset keys into layer names
+        visibility_presets = {}
+        for name, entries in item.get('visibilityPresets', {}).items():
+            visibility_presets[name] = [
+                (key, value, key.split('/')[-1])
+                for key, value in entries.items()
+            ]
+
+        # layer searchterms are filtered if there is any fulltext search
+        filter_searchterms = any(
+            'provider' in search_provider and (
+                search_provider['provider'] == 'solr' or
+                search_provider['provider'] == 'fulltext'
+            )
+            for search_provider in item.get('searchProviders', [])
+        )
+
+        return {
+            'layers': layers,
+            'visibility_presets': visibility_presets,
+            'filter_searchterms': filter_searchterms
         }
 
     def extract_base64_theme_item_thumbnail_images(self, theme_group):
-        """Recursively extract any Base64 encoded theme item thumbnail images
-        to files.
+        """Recursively register any Base64 encoded theme item thumbnail images
+        for extraction.
 
         :param obj theme_group: Theme group
         """
@@ -742,7 +1697,7 @@ class QWC2Viewer:
                 image_path = None
                 if 'thumbnail_base64' in item:
                     image_path = self.extract_base64_thumbnail_image(
-                        item['name'], item['thumbnail_base64']
+                        item['thumbnail_base64']
                     )
                     # remove thumbnail_base64
                     del item['thumbnail_base64']
@@ -758,8 +1713,8 @@ class QWC2Viewer:
                 self.extract_base64_theme_item_thumbnail_images(subgroup)
 
     def extract_base64_background_layer_thumbnail_images(self, themes):
-        """Extract any Base64 encoded background layer thumbnail images
-        to files.
+        """Register any Base64 encoded background layer thumbnail images
+        for extraction.
 
         :param obj themes: qwc2_themes
         """
@@ -768,7 +1723,7 @@ class QWC2Viewer:
                 image_path = None
                 if 'thumbnail_base64' in layer:
                     image_path = self.extract_base64_thumbnail_image(
-                        "bg_%s" % layer['name'], layer['thumbnail_base64']
+                        layer['thumbnail_base64']
                     )
                     # remove thumbnail_base64
                     del layer['thumbnail_base64']
@@ -779,47 +1734,183 @@ class QWC2Viewer:
                 # update thumbnail path
                 layer['thumbnail'] = image_path
 
-    def extract_base64_thumbnail_image(self, name, thumbnail_base64):
-        """Extract Base64 encoded thumbnail image to file and return
-        its assets path.
+    def extract_base64_thumbnail_image(self, thumbnail_base64):
+        """Register Base64 encoded thumbnail image for extraction on first
+        request and return its content addressed assets path.
 
-        :param str name: Image name
         :param str thumbnail_base64: Base64 encoded image
         """
-        image_path = None
+        # NOTE: the filename is derived from the content, so the image may
+        #       be cached in clients
+        digest = hashlib.sha256(thumbnail_base64.encode('utf-8')).hexdigest()
+        if self.thumbnail_transcoding:
+            # add transcoding settings, as transcoded images with other
+            # settings would otherwise be served at the same URL
+            filename = "%s-%s.png" % (digest, self.thumbnail_settings_digest)
+        else:
+            filename = "%s.png" % digest
+        self.base64_images[filename] = thumbnail_base64
+
+        # mark as extracted image for assets URL
+        return os.path.join(
+            self.BASE64_IMAGE_ROUTE_PREFIX, 'mapthumbs', filename
+        )
 
+    def extract_thumbnail_files(self, filename, thumbnail_base64):
+        """Extract all variants of Base64 encoded thumbnail image to files in
+        thumbnail cache dir and return whether the files are available.
+
+        :param str filename: Content addressed filename
+        :param str thumbnail_base64: Base64 encoded image
+        """
+        variants = self.thumbnail_variants(filename, thumbnail_base64)
+        if variants is None:
+            return False
+
+        stem = os.path.splitext(filename)[0]
         try:
-            if self.images_temp_dir is None:
-                # create temporary target dir
-                self.images_temp_dir = tempfile.TemporaryDirectory(
-                    prefix='qwc-map-viewer-'
+            os.makedirs(self.thumbnail_cache_dir, mode=0o700, exist_ok=True)
+
+            for image_format, image in variants.items():
+                extension = self.THUMBNAIL_FORMATS[image_format][2]
+                file_path = os.path.join(
+                    self.thumbnail_cache_dir, stem + extension
                 )
-                os.makedirs(
-                    os.path.join(self.images_temp_dir.name, 'mapthumbs')
+
+                # save as image file
+                # NOTE: write to temp file and rename, so that concurrent
+                #       workers never see partially written files
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=self.thumbnail_cache_dir, suffix='.tmp'
                 )
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(image)
+                    os.chmod(tmp_path, 0o644)
+                    os.replace(tmp_path, file_path)
+                except Exception:
+                    os.remove(tmp_path)
+                    raise
+        except Exception as e:
+            self.logger.error(
+                "Could not extract Base64 encoded thumbnail image '%s':"
+                "\n%s" % (filename, e)
+            )
+            return False
+
+        return True
 
-            # NOTE: do not add a random suffix so it may be cached in clients
-            filename = "%s.png" % name
+    def prepare_thumbnail_cache_dir(self):
+        """Create thumbnail cache dir, if missing, and return whether it is
+        safe to serve its files.
 
-            # decode and save as image file
-            file_path = os.path.join(
-                self.images_temp_dir.name, 'mapthumbs', filename
+        NOTE: files in the thumbnail cache dir are served without checking
+              their content, so the dir must be owned by the service user
+              and must not be writable by others
+        """
+        try:
+            os.makedirs(self.thumbnail_cache_dir, mode=0o700, exist_ok=True)
+            dir_stat = os.lstat(self.thumbnail_cache_dir)
+        except Exception as e:
+            self.logger.error(
+                "Could not create thumbnail cache dir '%s':\n%s" %
+                (self.thumbnail_cache_dir, e)
             )
-            with open(file_path, 'wb') as f:
-                f.write(base64.b64decode(thumbnail_base64))
+            return False
 
-            # mark as extracted image for assets URL
-            image_path = os.path.join(
-                self.BASE64_IMAGE_ROUTE_PREFIX, 'mapthumbs', filename
+        if not stat.S_ISDIR(dir_stat.st_mode):
+            self.logger.error(
+                "Thumbnail cache dir '%s' is not a directory" %
+                self.thumbnail_cache_dir
+            )
+            return False
+        if dir_stat.st_uid != os.getuid():
+            self.logger.error(
+                "Thumbnail cache dir '%s' is not owned by the service user" %
+                self.thumbnail_cache_dir
+            )
+            return False
+        if dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            self.logger.error(
+                "Thumbnail cache dir '%s' is writable by group or others" %
+                self.thumbnail_cache_dir
             )
+            return False
+
+        return True
+
+    def thumbnail_variants(self, filename, thumbnail_base64):
+        """Decode Base64 encoded thumbnail image and return its variants as
+        {<format>: <image data>}, or None on error.
+
+        If thumbnail transcoding is enabled, the image is resized and
+        transcoded to all supported formats.
+
+        :param str filename: Content addressed filename
+        :param str thumbnail_base64: Base64 encoded image
+        """
+        try:
+            image = base64.b64decode(thumbnail_base64)
+            if not self.thumbnail_transcoding:
+                return {'png': image}
+
+            with metrics.stage('transcode_thumbnail'):
+                return self.transcode_thumbnail(image)
         except Exception as e:
-            image_path = None
             self.logger.error(
-                "Could not extract Base64 encoded thumbnail image for '%s':"
-                "\n%s" % (name, e)
+                "Could not decode Base64 encoded thumbnail image '%s':"
+                "\n%s" % (filename, e)
             )
+            return None
+
+    def transcode_thumbnail(self, image_data):
+        """Resize thumbnail image to thumbnail_size and return it as PNG and
+        any supported thumbnail_formats as {<format>: <image data>}.
+
+        :param bytes image_data: Source image
+        """
+        variants = {}
+        with Image.open(io.BytesIO(image_data)) as source:
+            source.load()
+            image = source
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            # downscale to fit within thumbnail size, keeping aspect ratio
+            image.thumbnail(tuple(self.thumbnail_size), Image.LANCZOS)
+
+            for image_format in ['png'] + self.thumbnail_formats:
+                if image_format == 'png':
+                    options = {'optimize': True}
+                else:
+                    options = {'quality': self.thumbnail_quality}
+                output = io.BytesIO()
+                image.save(
+                    output, format=self.THUMBNAIL_FORMATS[image_format][0],
+                    **options
+                )
+                variants[image_format] = output.getvalue()
 
-        return image_path
+        return variants
+
+    def supported_thumbnail_formats(self, thumbnail_formats):
+        """Return thumbnail formats supported by the installed Pillow.
+
+        :param list(str) thumbnail_formats: Configured thumbnail formats
+        """
+        Image.init()
+        formats = []
+        for image_format in thumbnail_formats:
+            if image_format == 'png':
+                # always present as fallback
+                continue
+            spec = self.THUMBNAIL_FORMATS.get(image_format)
+            if spec is None or spec[0] not in Image.SAVE:
+                self.logger.warning(
+                    "Thumbnail format '%s' is not supported" % image_format
+                )
+                continue
+            formats.append(image_format)
+        return formats
 
     def translate_designer_form(self, path, lang):
         """Return translated qt designed form, if possible.
@@ -827,41 +1918,93 @@ class QWC2Viewer:
         :param str path: Designed form path
         :param str lang: Desired language
         """
-        # Attempt to read form
-        full_path = os.path.join(self.qwc2_path, 'assets', path)
-        try:
-            with open(full_path, 'r') as fh:
-                form = fh.read()
-        except:
+        designer_form = self.translated_designer_form(path, lang)
+        if designer_form is None:
             return abort(404)
 
-        if not lang:
-            return Response(form, mimetype='text/xml')
+        response = Response(designer_form['form'], mimetype='text/xml')
+        response.set_etag(designer_form['etag'])
+        return response.make_conditional(request)
 
-        # Look for translation file
-        basename = os.path.splitext(os.path.basename(path))[0]
-        translation_path = os.path.join(os.path.dirname(full_path), basename + "_{lang}.ts")
-        if os.path.isfile(translation_path.format(lang=lang)):
-            # Full locale (i.e. en-US)
-            translation_path = translation_path.format(lang=lang)
-        elif os.path.isfile(translation_path.format(lang=lang[0:2])):
-            # Lang only (i.e. en)
-            translation_path = translation_path.format(lang=lang[0:2])
-        else:
-            return Response(form, mimetype='text/xml')
+    def translated_designer_form(self, path, lang):
+        """Return cached translated qt designed form and its ETag,
+        or None if form could not be read.
+
+        :param str path: Designed form path
+        :param str lang: Desired language
+        """
+        full_path = os.path.join(self.qwc2_path, 'assets', path)
+        try:
+            form_mtime = os.path.getmtime(full_path)
+        except OSError:
+            return None
 
+        # Look for translation file
+        translation_path = None
+        translation_mtime = None
+        if lang:
+            basename = os.path.splitext(os.path.basename(path))[0]
+            translation_file = os.path.join(os.path.dirname(path), basename + "_{lang}.ts")
+            if self.asset_exists(translation_file.format(lang=lang)):
+                # Full locale (i.e. en-US)
+                translation_file = translation_file.format(lang=lang)
+            elif self.asset_exists(translation_file.format(lang=lang[0:2])):
+                # Lang only (i.e. en)
+                translation_file = translation_file.format(lang=lang[0:2])
+            else:
+                translation_file = None
+
+            if translation_file is not None:
+                translation_path = os.path.join(self.qwc2_path, 'assets', translation_file)
+                try:
+                    translation_mtime = os.path.getmtime(translation_path)
+                except OSError:
+                    translation_path = None
+
+        cache_key = (full_path, form_mtime, translation_path, translation_mtime)
+        designer_form = self.designer_form_cache.get(cache_key)
+        if designer_form is None:
+            # Attempt to read form
+            try:
+                with open(full_path, 'r') as fh:
+                    form = fh.read()
+            except:
+                return None
+
+            if translation_path is not None:
+                with metrics.stage('translate_form'):
+                    form = self.apply_designer_form_translation(form, translation_path)
+
+            if isinstance(form, str):
+                form = form.encode('utf-8')
+
+            designer_form = {
+                'form': form,
+                'etag': hashlib.sha1(form).hexdigest()
+            }
+            self.designer_form_cache.set(cache_key, designer_form)
+
+        return designer_form
+
+    def apply_designer_form_translation(self, form, translation_path):
+        """Return translated qt designed form, or original form if
+        translation failed.
+
+        :param str form: Designed form XML
+        :param str translation_path: Path to Qt translation file
+        """
         # Attempt to load translation file
         try:
             with open(translation_path, 'r', encoding='utf-8') as fh:
                 translation = fh.read()
         except:
-            return Response(form, mimetype='text/xml')
+            return form
 
         try:
             form_document = ElementTree.fromstring(form)
             ts_document = ElementTree.fromstring(translation)
         except:
-            return Response(form, mimetype='text/xml')
+            return form
 
         # Build translation string lookup
         translations = {}
@@ -878,22 +2021,215 @@ class QWC2Viewer:
             if string.text in translations:
                 string.text = translations[string.text]
 
-        form =  ElementTree.tostring(form_document, encoding='utf8', method='xml')
-        return Response(form, mimetype='text/xml')
+        return ElementTree.tostring(form_document, encoding='utf8', method='xml')
+
+    def prewarm_designer_forms(self, languages):
+        """Translate all designed forms in assets/ for the given languages
+        and store them in the designer form cache.
+
+        :param list(str) languages: Languages to pre-warm, '' for untranslated
+        """
+        if not languages:
+            return
+
+        count = 0
+        for path in self.collect_asset_files():
+            if not path.lower().endswith('.ui'):
+                continue
+            for lang in languages:
+                if self.translated_designer_form(path, lang) is not None:
+                    count += 1
+
+        self.logger.debug("Pre-warmed %d designer forms" % count)
+
+    def permissions_fingerprint(self, identity):
+        """Return fingerprint of effective permissions for identity.
+
+        :param obj identity: User identity
+        """
+        return tuple(self.permissions_handler.identity_roles(identity))
+
+    def warmup_identities(self):
+        """Return identities for all distinct role sets of the users and
+        groups in the permissions, and the anonymous identity.
+        """
+        identities = [None]
+        identities += [
+            {'username': username}
+            for username in self.permissions_handler.permissions.get('users', {})
+        ]
+        identities += [
+            {'groups': [group]}
+            for group in self.permissions_handler.permissions.get('groups', {})
+        ]
+
+        # one identity per role set
+        role_set_identities = {}
+        for identity in identities:
+            role_set_identities.setdefault(
+                self.permissions_fingerprint(identity), identity
+            )
+
+        return list(role_set_identities.values())
 
-    def permitted_themes(self, identity, lang, permitted_theme_ids=[]):
+    def permitted_themes(self, identity, lang, permitted_theme_ids=None):
         """Return qwc2_themes filtered by permissions.
 
+        NOTE: the returned themes are cached and shared between identities
+              with the same roles, and must not be modified
+
+        :param obj identity: User identity
+        :param str lang: The viewer language
+        :param list permitted_theme_ids: Optional list to collect permitted
+                                         theme ids
+        """
+        cached = self.permitted_themes_entry(identity, lang)
+
+        if permitted_theme_ids is not None:
+            permitted_theme_ids.extend(cached['theme_ids'])
+
+        return cached['themes']
+
+    def permitted_themes_entry(self, identity, lang):
+        """Return cache entry with qwc2_themes filtered by permissions.
+
+        Returns dict as:
+            {
+                themes: <filtered themes>,
+                theme_ids: <list of permitted theme ids>,
+                json: <optional serialized themes.json>,
+                compressed: <optional compressed themes.json by encoding>
+            }
+
         :param obj identity: User identity
+        :param str lang: The viewer language
+        """
+        cache_key = (
+            self.permissions_fingerprint(identity), lang, url_for('editConfig')
+        )
+        cached = self.themes_cache.get(cache_key)
+        if cached is None:
+            # compute only once for concurrent requests with the same key
+            cached = self.themes_single_flight.do(
+                cache_key,
+                lambda: self.build_permitted_themes_entry(identity, lang, cache_key)
+            )
+
+        return cached
+
+    def build_permitted_themes_entry(self, identity, lang, cache_key):
+        """Filter qwc2_themes by permissions and store result in themes cache.
+
+        :param obj identity: User identity
+        :param str lang: The viewer language
+        :param tuple cache_key: Themes cache key
+        """
+        # re-check cache, as a previous computation with the same key may
+        # have finished just before this one started
+        cached = self.themes_cache.get(cache_key, record_stats=False)
+        if cached is not None:
+            return cached
+
+        theme_ids = []
+        with metrics.stage('permissions'):
+            permission_context = self.permission_context(identity)
+        with metrics.stage('filter_themes'):
+            themes = self.filter_themes(permission_context, lang, theme_ids)
+        cached = {
+            'themes': themes,
+            'theme_ids': theme_ids
+        }
+        self.themes_cache.set(cache_key, cached)
+
+        return cached
+
+    def permission_context(self, identity):
+        """Return identity-level permissions, resolved once for filtering
+        all theme items.
+
+        Returns lookup dict as:
+            {
+                identity: <identity>,
+                permissions_default_allow: <bool>,
+                background_layers: [<background layer>],
+                all_bg_permitted: <bool>,
+                solr_facets: [<facet>],
+                all_facets_permitted: <bool>,
+                theme_info_links: [<theme info link>],
+                plugin_data: {
+                    <plugin>: {<resource>}
+                },
+                restricted_oblique_datasets: [<dataset>],
+                permitted_oblique_datasets: [<dataset>],
+                edit_config_url: <editConfig URL>
+            }
+
+        :param obj identity: User identity
+        """
+        permissions = self.permissions_handler
+
+        # get permissions for background layers
+        permitted_bg_layers = permissions.resource_permissions(
+            'background_layers', identity
+        )
+
+        # get permissions for Solr facets
+        permitted_solr_facets = permissions.resource_permissions(
+            'solr_facets', identity
+        )
+
+        # lookup for combined permissions for theme plugin data by plugin
+        plugin_permissions = {}
+        for permission in permissions.resource_permissions(
+            'plugin_data', identity
+        ):
+            # collect permitted plugin resources
+            plugin = permission.get('name')
+            if plugin not in plugin_permissions:
+                plugin_permissions[plugin] = set()
+            plugin_permissions[plugin].update(
+                permission.get('resources', [])
+            )
+
+        return {
+            'identity': identity,
+            'permissions_default_allow':
+                permissions.permissions_default_allow(),
+            'background_layers': permitted_bg_layers,
+            'all_bg_permitted': '*' in permitted_bg_layers,
+            'solr_facets': permitted_solr_facets,
+            'all_facets_permitted': '*' in permitted_solr_facets,
+            'theme_info_links': permissions.resource_permissions(
+                'theme_info_links', identity
+            ),
+            'plugin_data': plugin_permissions,
+            'restricted_oblique_datasets': permissions.resource_restrictions(
+                'oblique_image_datasets', identity
+            ),
+            'permitted_oblique_datasets': permissions.resource_permissions(
+                'oblique_image_datasets', identity
+            ),
+            'edit_config_url': url_for('editConfig')
+        }
+
+    def filter_themes(self, permission_context, lang, permitted_theme_ids):
+        """Return new copy of qwc2_themes filtered by permissions.
+
+        NOTE: the source qwc2_themes are never modified. Filtered entries are
+              replaced by new objects, while any unmodified entries are
+              shared with the source.
+
+        :param obj permission_context: Permission context of identity
+        :param str lang: The viewer language
         :param list permitted_theme_ids: List of permitted theme ids
         """
-        # deep copy qwc2_themes
-        themes = json.loads(json.dumps(self.resources['qwc2_themes']))
+        source_themes = self.resources['qwc2_themes']
+        themes = dict(source_themes)
 
         # filter theme items by permissions
         items = []
-        for item in themes['items']:
-            permitted_item = self.permitted_theme_item(item, identity, lang)
+        for item in source_themes['items']:
+            permitted_item = self.permitted_theme_item(item, permission_context, lang)
             if permitted_item:
                 permitted_theme_ids.append(permitted_item['id'])
                 items.append(permitted_item)
@@ -903,14 +2239,14 @@ class QWC2Viewer:
         themes['items'] = items
 
         # filter theme groups by permissions
-        groups = []
-        for group in themes['subdirs']:
-            permitted_group = self.permitted_theme_group(group, identity, lang, permitted_theme_ids)
-            if permitted_group:
-                groups.append(permitted_group)
+        # NOTE: empty top level groups are kept
+        themes['subdirs'] = [
+            self.permitted_theme_group(group, permission_context, lang, permitted_theme_ids)
+            for group in source_themes['subdirs']
+        ]
 
         # filter background layers by permissions
-        self.filter_background_layers(themes, identity)
+        self.filter_background_layers(themes, permission_context)
 
         # filter unused external layers
         self.filter_external_layers(themes)
@@ -923,48 +2259,52 @@ class QWC2Viewer:
 
         # Set default theme
         default_themes = sorted(self.permissions_handler.resource_permissions(
-            'default_theme', identity
+            'default_theme', permission_context['identity']
         ), key=lambda item: item['priority'], reverse=True)
         if default_themes:
             themes['defaultTheme'] = default_themes[0]['name']
 
         return themes
 
-    def permitted_theme_group(self, theme_group, identity, lang, permitted_theme_ids):
-        """Return theme group filtered by permissions.
+    def permitted_theme_group(self, theme_group, permission_context, lang, permitted_theme_ids):
+        """Return new theme group filtered by permissions.
 
         :param obj theme_group: Theme group
-        :param obj identity: User identity
+        :param obj permission_context: Permission context of identity
         :param str lang: The viewer language
         :param list permitted_theme_ids: List of permitted theme ids
         """
         # collect theme items
         items = []
         for item in theme_group['items']:
-            permitted_item = self.permitted_theme_item(item, identity, lang)
+            permitted_item = self.permitted_theme_item(item, permission_context, lang)
             if permitted_item:
                 permitted_theme_ids.append(permitted_item['id'])
                 items.append(permitted_item)
             else:
                 self.add_restricted_item(items, item)
 
-        theme_group['items'] = items
-
         # collect sub groups
         subgroups = []
         for subgroup in theme_group['subdirs']:
             # recursively filter sub group
-            permitted_subgroup = self.permitted_theme_group(subgroup, identity, lang, permitted_theme_ids)
-            if permitted_subgroup:
+            permitted_subgroup = self.permitted_theme_group(subgroup, permission_context, lang, permitted_theme_ids)
+            if permitted_subgroup['items'] or permitted_subgroup['subdirs']:
                 subgroups.append(permitted_subgroup)
+            # else: remove empty theme group
 
-        theme_group['subdirs'] = subgroups
+        return dict(theme_group, items=items, subdirs=subgroups)
 
-        if not items and not subgroups:
-            # remove empty theme group
-            return None
+    def show_restricted_item(self, item):
+        """Return whether to show a placeholder for a restricted theme item.
 
-        return theme_group
+        :param obj item: Theme item
+        """
+        if not self.show_restricted_themes:
+            return False
+        if self.show_restricted_themes_whitelist and not item["name"] in self.show_restricted_themes_whitelist:
+            return False
+        return True
 
     def add_restricted_item(self, items, item):
         """Add restricted theme item placeholders if enabled by configuration
@@ -972,9 +2312,7 @@ class QWC2Viewer:
         :param obj items: Items list to which to add the placeholder to
         :param obj item: The item for which to add the placeholder
         """
-        if not self.show_restricted_themes:
-            return
-        if self.show_restricted_themes_whitelist and not item["name"] in self.show_restricted_themes_whitelist:
+        if not self.show_restricted_item(item):
             return
 
         items.append({
@@ -985,13 +2323,18 @@ class QWC2Viewer:
             "restricted": True
         })
 
-    def permitted_theme_item(self, item, identity, lang):
-        """Return theme item filtered by permissions.
+    def permitted_theme_item(self, item, permission_context, lang):
+        """Return new theme item filtered by permissions.
+
+        NOTE: all filters below modify the shallow copy of the item and must
+              replace any nested entries instead of modifying them in place
 
         :param obj item: Theme item
-        :param obj identity: User identity
+        :param obj permission_context: Permission context of identity
         :param str lang: The viewer language
         """
+        identity = permission_context['identity']
+
         # get permissions for WMS
         wms_name = item['wms_name']
         wms_permissions = self.permissions_handler.resource_permissions(
@@ -1001,6 +2344,10 @@ class QWC2Viewer:
             # WMS not permitted
             return None
 
+        # lookup for precompiled layer tree of source theme item
+        layer_index = self.resources['theme_layer_indexes'][id(item)]
+
+        item = dict(item)
         item['url'] = "%s%s" % (self.ogc_service_url, wms_name)
         item['featureInfoUrl'] = "%s%s" % (self.info_service_url, wms_name)
         item['legendUrl'] = "%s%s?%s" % (self.legend_service_url, wms_name, item.get("extraLegendParameters", ""))
@@ -1025,31 +2372,43 @@ class QWC2Viewer:
         )
         permitted_3d_objects = permission.get('objects_3d', [])
 
+        # collect permitted search facets if layer searchterms are filtered
+        permitted_solr_facets = None
+        if layer_index['filter_searchterms']:
+            permitted_solr_facets = permission_context['solr_facets']
+
+        layertree_translations = None
+        if lang in item.get('translations', {}):
+            layertree_translations = item['translations'][lang].get(
+                'layertree', {}
+            )
+
         # filter by permissions
-        hasRestrictedContent |= self.filter_restricted_layers(item, permitted_layers)
-        self.filter_visibility_presets(item, permitted_layers)
+        hasRestrictedContent |= self.filter_restricted_layers(
+            item, layer_index, permitted_layers, permitted_solr_facets,
+            layertree_translations
+        )
+        self.filter_visibility_presets(item, layer_index, permitted_layers)
         self.filter_print_templates(item, permitted_print_templates)
-        self.filter_item_background_layers(item, identity)
-        self.filter_item_search_providers(item, identity)
+        self.filter_item_background_layers(item, permission_context)
+        self.filter_item_search_providers(item, permission_context)
         self.filter_item_external_layers(item, permitted_layers)
-        self.filter_item_theme_info_links(item, identity)
-        self.filter_item_plugin_data(item, identity)
-        self.filter_item_snapping_config(item, identity, permitted_layers)
-        self.filter_item_3d_objects(item, identity, permitted_3d_objects, restricted_3d_objects)
-        self.filter_item_oblique_image_datasets(item, identity)
+        self.filter_item_theme_info_links(item, permission_context)
+        self.filter_item_plugin_data(item, permission_context)
+        self.filter_item_snapping_config(item, permitted_layers)
+        self.filter_item_3d_objects(item, permission_context, permitted_3d_objects, restricted_3d_objects)
+        self.filter_item_oblique_image_datasets(item, permission_context)
 
         if lang in item.get('translations', {}):
             translations = item['translations'][lang]
-            # Apply translations to theme title, layers, print layouts immediately
-            def apply_translations(item, layertreetranslations):
-                for sublayer in item.get('sublayers', []):
-                    sublayer['title'] = layertreetranslations.get(sublayer['name'], sublayer['title'])
-                    apply_translations(sublayer, layertreetranslations)
-            apply_translations(item, translations.get('layertree', {}))
-
+            # Apply translations to theme title, print layouts immediately
+            # NOTE: layer translations are applied in filter_restricted_layers
             item['title'] = translations.get('theme', {}).get('title', item['title'])
-            for layout in item.get('print', []):
-                layout['title'] = translations.get('layouts', {}).get(layout['name'], layout['title'])
+            if 'print' in item:
+                item['print'] = [
+                    dict(layout, title=translations.get('layouts', {}).get(layout['name'], layout['title']))
+                    for layout in item['print']
+                ]
 
             item['translationsUrl'] = item['url'] + "?SERVICE=GetTranslations&LANG=" + lang
             del item['translations']
@@ -1060,45 +2419,84 @@ class QWC2Viewer:
         # self.filter_edit_config(item, identity)
         if item.get('editConfig'):
             del item['editConfig']
-            item['editConfigUrl'] = url_for('editConfig') + "?map=" + item['wms_name'] + "&layers="
+            item['editConfigUrl'] = permission_context['edit_config_url'] + "?map=" + item['wms_name'] + "&layers="
 
         if self.flag_themes_with_restricted_content:
             item['hasRestrictedContent'] = hasRestrictedContent
 
         return item
 
-    def filter_restricted_layers(self, layer, permitted_layers):
-        """Recursively filter layers by permissions.
+    def filter_restricted_layers(self, item, layer_index, permitted_layers,
+                                 permitted_solr_facets, layertree_translations):
+        """Filter layer tree of theme item by permissions and return whether
+        any layers are restricted.
+
+        Emits new layers for the permitted layers in a single pass over the
+        flattened layers of the layer index, filtering any layer searchterms
+        and applying layer translations on the way.
 
-        :param obj layer: Layer or group layer
+        :param obj item: Theme item
+        :param obj layer_index: Layer index of theme item
         :param set permitted_layers: List of permitted layers
+        :param list permitted_solr_facets: Permitted Solr facets for filtering
+                                           layer searchterms (None to skip)
+        :param obj layertree_translations: Layer titles by name
+                                           (None to skip)
         """
         hasRestricted = False
-        if layer.get('sublayers'):
-            # group layer
-            # collect permitted sub layers
-            sublayers = []
-            for sublayer in layer['sublayers']:
-                # check permissions
-                if sublayer['name'] in permitted_layers:
-                    # recursively filter sub layer
-                    hasRestricted |= self.filter_restricted_layers(sublayer, permitted_layers)
-                    sublayers.append(sublayer)
-                else:
-                    hasRestricted = True
+        layers = layer_index['layers']
+        if not layers:
+            # data layer
+            if permitted_solr_facets is not None:
+                self.filter_layer_searchterms(item, permitted_solr_facets)
+            return hasRestricted
+
+        item['sublayers'] = []
+
+        # new layers by index, None if not permitted
+        emitted = [None] * len(layers)
+        for idx, (layer, parent_idx, is_group) in enumerate(layers):
+            if parent_idx < 0:
+                parent = item
+            else:
+                parent = emitted[parent_idx]
+                if parent is None:
+                    # skip sub layer of restricted group
+                    continue
+
+            # check permissions
+            if layer['name'] not in permitted_layers:
+                hasRestricted = True
+                continue
+
+            layer = dict(layer)
+            if is_group:
+                # collect permitted sub layers
+                layer['sublayers'] = []
+            elif permitted_solr_facets is not None:
+                self.filter_layer_searchterms(layer, permitted_solr_facets)
+            if layertree_translations is not None:
+                layer['title'] = layertree_translations.get(layer['name'], layer['title'])
+
+            emitted[idx] = layer
+            parent['sublayers'].append(layer)
 
-            layer['sublayers'] = sublayers
         return hasRestricted
 
-    def filter_visibility_presets(self, item, permitted_layers):
+    def filter_visibility_presets(self, item, layer_index, permitted_layers):
         """Filter visibility presets by permissions.
 
         :param obj item: Theme item
+        :param obj layer_index: Layer index of theme item
         :param set permitted_layers: List of permitted layers
         """
-        for name, entries in item.get('visibilityPresets', {}).items():
-            item['visibilityPresets'][name] = dict([
-                kv for kv in entries.items() if kv[0].split('/')[-1] in permitted_layers
+        if 'visibilityPresets' in item:
+            item['visibilityPresets'] = dict([
+                (name, dict([
+                    (key, value) for key, value, layer_name in entries
+                    if layer_name in permitted_layers
+                ]))
+                for name, entries in layer_index['visibility_presets'].items()
             ])
 
     def filter_print_templates(self, item, permitted_print_templates):
@@ -1125,40 +2523,50 @@ class QWC2Viewer:
             item.pop('printLabelConfig', None)
             item.pop('printLabelForSearchResult', None)
 
-            for bg in item.get('backgroundLayers', []):
-                bg.pop('printLayer', None)
+            if 'backgroundLayers' in item:
+                item['backgroundLayers'] = [
+                    dict([kv for kv in bg.items() if kv[0] != 'printLayer'])
+                    for bg in item['backgroundLayers']
+                ]
 
     def filter_edit_config(self, item, identity):
-        """Filter edit config by permissions.
+        """Return new edit config of theme item filtered by permissions.
 
         :param obj item: Theme item
         :param obj identity: User identity
         """
         if not item.get('editConfig'):
             # no edit config or blank
-            return
+            return {}
 
         # collect permitted edit datasets
         edit_config = {}
         for name, config in item.get('editConfig').items():
-            # dataset name from editDataset or WMS and name
-            dataset = "%s.%s" % (item['wms_name'], name)
-            dataset = config.get('editDataset', dataset)
-
-            permitted_dataset = self.permitted_dataset(
-                dataset, config, identity
+            permitted_dataset = self.permitted_edit_dataset(
+                item, name, config, identity
             )
             if permitted_dataset:
                 edit_config[name] = permitted_dataset
 
-        if edit_config:
-            item['editConfig'] = edit_config
-        else:
-            # no permitted datasets
-            item['editConfig'] = {}
+        return edit_config
+
+    def permitted_edit_dataset(self, item, name, config, identity):
+        """Return new edit dataset config of theme item filtered by
+        permissions.
+
+        :param obj item: Theme item
+        :param str name: Layer name
+        :param obj config: Edit dataset config
+        :param obj identity: User identity
+        """
+        # dataset name from editDataset or WMS and name
+        dataset = "%s.%s" % (item['wms_name'], name)
+        dataset = config.get('editDataset', dataset)
+
+        return self.permitted_dataset(dataset, config, identity)
 
     def permitted_dataset(self, dataset, config, identity):
-        """Return edit dataset filtered by permissions.
+        """Return new edit dataset config filtered by permissions.
 
         :param str dataset: Dataset ID
         :param obj config: Edit dataset config
@@ -1198,6 +2606,7 @@ class QWC2Viewer:
         deletable |= writable
 
         # filter attributes by permissions
+        config = dict(config)
         config['fields'] = [
             field for field in config.get('fields', [])
             if field['id'] in permitted_attributes
@@ -1212,17 +2621,14 @@ class QWC2Viewer:
 
         return config
 
-    def filter_background_layers(self, themes, identity):
+    def filter_background_layers(self, themes, permission_context):
         """Filter available background layers by permissions.
 
         :param obj themes: qwc2_themes
-        :param obj identity: User identity
+        :param obj permission_context: Permission context of identity
         """
-        # get permissions for background layers
-        permitted_bg_layers = self.permissions_handler.resource_permissions(
-            'background_layers', identity
-        )
-        all_bg_permitted = '*' in permitted_bg_layers
+        permitted_bg_layers = permission_context['background_layers']
+        all_bg_permitted = permission_context['all_bg_permitted']
 
         # filter background layers by permissions
         themes['backgroundLayers'] = [
@@ -1230,21 +2636,18 @@ class QWC2Viewer:
             if layer['name'] in permitted_bg_layers or all_bg_permitted
         ]
 
-    def filter_item_background_layers(self, item, identity):
+    def filter_item_background_layers(self, item, permission_context):
         """Filter theme item background layers by permissions.
 
         :param obj item: Theme item
-        :param obj identity: User identity
+        :param obj permission_context: Permission context of identity
         """
         if not item.get('backgroundLayers'):
             # no background layers
             return
 
-        # get permissions for background layers
-        permitted_bg_layers = self.permissions_handler.resource_permissions(
-            'background_layers', identity
-        )
-        all_bg_permitted = '*' in permitted_bg_layers
+        permitted_bg_layers = permission_context['background_layers']
+        all_bg_permitted = permission_context['all_bg_permitted']
 
         # filter background layers by permissions
         item['backgroundLayers'] = [
@@ -1252,20 +2655,17 @@ class QWC2Viewer:
             if layer['name'] in permitted_bg_layers or all_bg_permitted
         ]
 
-    def filter_item_search_providers(self, item, identity):
+    def filter_item_search_providers(self, item, permission_context):
         """Filter theme item search providers by permissions.
 
         :param obj item: Theme item
-        :param obj identity: User identity
+        :param obj permission_context: Permission context of identity
         """
         if 'searchProviders' in item:
-            # get permissions for Solr facets
-            permitted_solr_facets = \
-                self.permissions_handler.resource_permissions(
-                    'solr_facets', identity
-                )
-            all_facets_permitted = '*' in permitted_solr_facets
+            permitted_solr_facets = permission_context['solr_facets']
+            all_facets_permitted = permission_context['all_facets_permitted']
 
+            search_providers = []
             for search_provider in item['searchProviders']:
                 if (
                     'provider' in search_provider
@@ -1276,8 +2676,9 @@ class QWC2Viewer:
                 ):
                     # filter fulltext search facets by permissions
                     # NOTE: adapt from old syntax solr -> fulltext, move 'default' and 'layers' below 'params'
+                    search_provider = dict(search_provider)
                     search_provider['provider'] = 'fulltext'
-                    search_provider['params'] = search_provider.get('params', {})
+                    search_provider['params'] = dict(search_provider.get('params', {}))
                     default_facets = search_provider['params'].get('default', search_provider.get('default', []))
                     layer_facets = search_provider['params'].get('layers', search_provider.get('layers', {}))
 
@@ -1296,33 +2697,31 @@ class QWC2Viewer:
                     if 'layers' in search_provider:
                         del search_provider['layers']
 
-                    # filter layer searchterms
-                    self.filter_layer_searchterms(item, permitted_solr_facets)
+                    # NOTE: layer searchterms are filtered in filter_restricted_layers
+
+                search_providers.append(search_provider)
+
+            item['searchProviders'] = search_providers
 
     def filter_layer_searchterms(self, layer, permitted_solr_facets):
-        """Recursively filter layer searchterms by permissions.
+        """Filter searchterms of data layer by permissions.
 
-        :param obj layer: Layer or group layer
+        NOTE: layer must be a copy
+
+        :param obj layer: Data layer
         :param set permitted_solr_facets: List of permitted Solr facets
         """
-        if layer.get('sublayers'):
-            # group layer
-            for sublayer in layer['sublayers']:
-                # recursively filter sub layer
-                self.filter_layer_searchterms(sublayer, permitted_solr_facets)
-        else:
-            # data layer
-            if 'searchterms' in layer:
-                # filter searchterms by permissions
-                searchterms = [
-                    facet for facet in layer['searchterms']
-                    if facet in permitted_solr_facets
-                ]
-                if searchterms:
-                    layer['searchterms'] = searchterms
-                else:
-                    # remove if no layer search permitted
-                    del layer['searchterms']
+        if 'searchterms' in layer:
+            # filter searchterms by permissions
+            searchterms = [
+                facet for facet in layer['searchterms']
+                if facet in permitted_solr_facets
+            ]
+            if searchterms:
+                layer['searchterms'] = searchterms
+            else:
+                # remove if no layer search permitted
+                del layer['searchterms']
 
     def filter_external_layers(self, themes):
         """Filter unused external layers.
@@ -1401,18 +2800,14 @@ class QWC2Viewer:
 
         return theme_info_links
 
-    def filter_item_theme_info_links(self, item, identity):
+    def filter_item_theme_info_links(self, item, permission_context):
         """Filter theme item theme info links by permissions.
 
         :param obj item: Theme item
-        :param obj identity: User identity
+        :param obj permission_context: Permission context of identity
         """
         if 'themeInfoLinks' in item:
-            # get permissions for theme info links
-            permitted_theme_info_links = \
-                self.permissions_handler.resource_permissions(
-                    'theme_info_links', identity
-                )
+            permitted_theme_info_links = permission_context['theme_info_links']
 
             # filter theme info links by permissions
             entries = [
@@ -1420,7 +2815,9 @@ class QWC2Viewer:
                 if entry in permitted_theme_info_links
             ]
             if entries:
-                item['themeInfoLinks']['entries'] = entries
+                item['themeInfoLinks'] = dict(
+                    item['themeInfoLinks'], entries=entries
+                )
             else:
                 # remove if no entries permitted
                 del item['themeInfoLinks']
@@ -1470,29 +2867,15 @@ class QWC2Viewer:
 
         return plugin_data
 
-    def filter_item_plugin_data(self, item, identity):
+    def filter_item_plugin_data(self, item, permission_context):
         """Filter theme item plugin data by permissions.
 
         :param obj item: Theme item
-        :param obj identity: User identity
+        :param obj permission_context: Permission context of identity
         """
         if 'pluginData' in item:
-            # get permissions for theme plugin data
-            permitted_plugin_data = \
-                self.permissions_handler.resource_permissions(
-                    'plugin_data', identity
-                )
-
             # lookup for combined permissions by plugin
-            plugin_permissions = {}
-            for permission in permitted_plugin_data:
-                # collect permitted plugin resources
-                plugin = permission.get('name')
-                if plugin not in plugin_permissions:
-                    plugin_permissions[plugin] = set()
-                plugin_permissions[plugin].update(
-                    permission.get('resources', [])
-                )
+            plugin_permissions = permission_context['plugin_data']
 
             # filter plugin data by permissions
             plugin_data = {}
@@ -1512,30 +2895,30 @@ class QWC2Viewer:
                 # remove if no plugin data permitted
                 del item['pluginData']
 
-    def filter_item_snapping_config(self, item, identity, permitted_layers):
+    def filter_item_snapping_config(self, item, permitted_layers):
         """Filter theme item snapping config by permissions.
 
         :param obj item: Theme item
-        :param obj identity: User identity
         :param set permitted_layers: List of permitted layers
         """
         if 'snapping' in item:
-            item['snapping']['snaplayers'] = list(
+            item['snapping'] = dict(item['snapping'], snaplayers=list(
                 filter(lambda entry: entry['name'] in permitted_layers, item['snapping']['snaplayers'])
-            )
+            ))
 
-    def filter_item_3d_objects(self, item, identity, permitted_3d_objects, restricted_3d_objects):
+    def filter_item_3d_objects(self, item, permission_context, permitted_3d_objects, restricted_3d_objects):
         """Filter theme item 3d tilesets by permissions.
 
         :param obj item: Theme item
-        :param obj identity: User identity
+        :param obj permission_context: Permission context of identity
         :param list permitted_3d_objects: permitted 3D objects
         :param list restricted_3d_objects: restricted 3D objects
         """
 
         # If wildcard permission is set, don't filter as they are all permitted
         if 'map3d' in item:
-            if self.permissions_handler.permissions_default_allow():
+            if permission_context['permissions_default_allow']:
+                item['map3d'] = dict(item['map3d'])
                 if 'tiles3d' in item['map3d']:
                     # NOTE: legacy format
                     item['map3d']['tiles3d'] = [
@@ -1557,6 +2940,7 @@ class QWC2Viewer:
                 ]
 
             elif '*' not in permitted_3d_objects:
+                item['map3d'] = dict(item['map3d'])
                 if 'tiles3d' in item['map3d']:
                     # NOTE: legacy format
                     item['map3d']['tiles3d'] = [
@@ -1576,21 +2960,16 @@ class QWC2Viewer:
                     if entry.get('name') in permitted_3d_objects
                 ]
 
-    def filter_item_oblique_image_datasets(self, item, identity):
+    def filter_item_oblique_image_datasets(self, item, permission_context):
         """Filter theme item 3d tilesets by permissions.
 
         :param obj item: Theme item
-        :param obj identity: User identity
-        :param list permitted_oblique_datasets: permitted oblique image tilesets
+        :param obj permission_context: Permission context of identity
         """
         if 'obliqueDatasets' in item:
-            restricted_oblique_datasets = self.permissions_handler.resource_restrictions(
-                'oblique_image_datasets', identity
-            )
-            permitted_oblique_datasets = self.permissions_handler.resource_permissions(
-                'oblique_image_datasets', identity
-            )
-            if self.permissions_handler.permissions_default_allow():
+            restricted_oblique_datasets = permission_context['restricted_oblique_datasets']
+            permitted_oblique_datasets = permission_context['permitted_oblique_datasets']
+            if permission_context['permissions_default_allow']:
                 item['obliqueDatasets'] = [
                     entry for entry in item['obliqueDatasets']
                     if entry['dataset'] not in restricted_oblique_datasets
@@ -3,15 +3,19 @@ import os
 import requests
 import urllib.parse
 
-from flask import json, Flask, request, jsonify, redirect
+from flask import abort, g, json, Flask, request, jsonify, redirect, Response
 
 from qwc_services_core.auth import auth_manager, optional_auth, get_identity
 from qwc_services_core.tenant_handler import TenantHandler, TenantPrefixMiddleware, TenantSessionInterface
-from qwc_services_core.runtime_config import RuntimeConfig
+from json_provider import json_provider_class
+from metrics import metrics
 from qwc2_viewer import QWC2Viewer
+from warmup import Warmup
 
 # Flask application
 app = Flask(__name__)
+# use orjson for JSON responses if available
+app.json = json_provider_class()(app)
 # disable verbose 404 error message
 app.config['ERROR_404_HELP'] = False
 
@@ -25,13 +29,18 @@ app.session_interface = TenantSessionInterface()
 
 
 def qwc2_viewer_handler():
-    """Get or create a QWC2Viewer instance for a tenant."""
-    tenant = tenant_handler.tenant()
-    handler = tenant_handler.handler('mapViewer', 'qwc', tenant)
-    if handler is None:
-        handler = tenant_handler.register_handler(
-            'qwc', tenant, QWC2Viewer(tenant, tenant_handler, app.logger))
-    return handler
+    """Get or create a QWC2Viewer instance for a tenant.
+
+    NOTE: the handler is looked up only once per request
+    """
+    if 'qwc2_viewer' not in g:
+        tenant = tenant_handler.tenant()
+        handler = tenant_handler.handler('mapViewer', 'qwc', tenant)
+        if handler is None:
+            handler = tenant_handler.register_handler(
+                'qwc', tenant, QWC2Viewer(tenant, tenant_handler, app.logger))
+        g.qwc2_viewer = handler
+    return g.qwc2_viewer
 
 
 def with_no_cache_headers(response):
@@ -45,24 +54,48 @@ def with_no_cache_headers(response):
     return response
 
 
+def with_json_cache_headers(response):
+    """Add cache headers to JSON response according to json_cache_mode.
+
+    :param obj response: Response
+    """
+    if qwc2_viewer_handler().json_cache_mode == 'revalidate':
+        # allow caching by client only, as the response depends on the
+        # identity, but always revalidate using ETag
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    else:
+        return with_no_cache_headers(response)
+
+
 def auth_path_prefix():
-    tenant = tenant_handler.tenant()
-    config_handler = RuntimeConfig("mapViewer", app.logger)
-    config = config_handler.tenant_config(tenant)
+    # use already loaded tenant config of handler
+    config = qwc2_viewer_handler().tenant_config
     auth_path = config.get('auth_service_url', '/auth/')
     return app.session_interface.tenant_path_prefix().rstrip("/") + "/" + auth_path.lstrip("/")
 
 
+@app.before_request
+def start_warmup():
+    """Start optional warm-up on first request in the current process."""
+    warmup.start()
+
+
+@app.before_request
+def start_request_metrics():
+    """Start timing of request for metrics and Server-Timing header."""
+    metrics.start_request()
+
+
 @app.before_request
 @optional_auth
 def assert_user_is_logged():
-    public_endpoints = ['healthz', 'ready']
+    public_endpoints = ['healthz', 'ready', 'metrics']
     if request.endpoint in public_endpoints:
         return
 
-    tenant = tenant_handler.tenant()
-    config_handler = RuntimeConfig("mapViewer", app.logger)
-    config = config_handler.tenant_config(tenant)
+    # use already loaded tenant config of handler
+    config = qwc2_viewer_handler().tenant_config
     public_paths = config.get("public_paths", [])
     if request.path in public_paths:
         return
@@ -75,6 +108,22 @@ def assert_user_is_logged():
             return redirect(prefix + '/login?url=%s' % urllib.parse.quote(request.url))
 
 
+@app.after_request
+def log_db_round_trips(response):
+    """Log number of config DB round trips of request."""
+    if 'db_round_trips' in g:
+        app.logger.debug(
+            "Config DB round trips for %s: %d" % (request.path, g.db_round_trips)
+        )
+    return response
+
+
+@app.after_request
+def finish_request_metrics(response):
+    """Record request metrics and add Server-Timing header."""
+    return metrics.finish_request(request.endpoint, response)
+
+
 # routes
 @app.route('/')
 @optional_auth
@@ -87,7 +136,7 @@ def index():
 @optional_auth
 def qwc2_config():
     qwc2_viewer = qwc2_viewer_handler()
-    return with_no_cache_headers(qwc2_viewer.qwc2_config(get_identity(), request.args))
+    return with_json_cache_headers(qwc2_viewer.qwc2_config(get_identity(), request.args))
 
 
 @app.route('/themes.json')
@@ -96,7 +145,7 @@ def qwc2_config():
 def qwc2_themes():
     qwc2_viewer = qwc2_viewer_handler()
     lang = request.args.get('lang', None)
-    return with_no_cache_headers(qwc2_viewer.qwc2_themes(get_identity(), lang))
+    return with_json_cache_headers(qwc2_viewer.qwc2_themes(get_identity(), lang))
 
 @app.route('/editConfig.json', endpoint="editConfig")
 @optional_auth
@@ -110,7 +159,7 @@ def edit_config():
         edit_config = qwc2_viewer.edit_config(get_identity(), wms_name, list(filter(bool, layers.split(","))))
     else:
         edit_config = qwc2_viewer.edit_config(get_identity(), wms_name, None)
-    return with_no_cache_headers(edit_config)
+    return with_json_cache_headers(edit_config)
 
 
 @app.route('/assets/<path:path>')
@@ -152,6 +201,8 @@ def favicon():
 """ readyness probe endpoint """
 @app.route("/ready", methods=['GET'])
 def ready():
+    if not warmup.ready():
+        return jsonify({"status": "WARMING_UP"}), 503
     return jsonify({"status": "OK"})
 
 
@@ -161,6 +212,19 @@ def healthz():
     return jsonify({"status": "OK"})
 
 
+""" Prometheus metrics endpoint """
+@app.route("/metrics", methods=['GET'], endpoint="metrics")
+def prometheus_metrics():
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+# optional warm-up of tenants, started lazily in each worker process
+# NOTE: created after all routes are registered
+warmup = Warmup(app, tenant_handler, app.logger)
+
+
 # local webserver
 if __name__ == '__main__':
     print("Starting Map viewer...")
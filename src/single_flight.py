@@ -0,0 +1,59 @@
+import threading
+
+
+class SingleFlight:
+    """SingleFlight class
+
+    Coalesce concurrent calls with the same key, so that only the first
+    caller runs the computation, while any concurrent callers wait for and
+    share its result.
+    """
+
+    def __init__(self):
+        """Constructor"""
+        # in-flight calls as
+        # {<key>: {'event': <Event>, 'result': <obj>, 'error': <Exception>}}
+        self.calls = {}
+        self.lock = threading.Lock()
+        # number of calls which shared the result of an in-flight call
+        self.shared = 0
+
+    def do(self, key, func):
+        """Return result of func, or of the in-flight call with the same key.
+
+        Any exception raised by func is raised in all callers.
+
+        :param obj key: Key of computation
+        :param func func: Function without arguments computing the result
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {
+                    'event': threading.Event(),
+                    'result': None,
+                    'error': None
+                }
+                self.calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            # wait for in-flight call
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = func()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['event'].set()
+
+        return call['result']
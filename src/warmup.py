@@ -0,0 +1,128 @@
+import os
+import threading
+
+from flask_jwt_extended import create_access_token
+
+
+class Warmup:
+    """Warmup class
+
+    Optionally warm up the Map Viewer handlers of the tenants listed in
+    WARMUP_TENANTS in a background thread on the first request of each
+    worker process, and precompute the filtered themes for each distinct
+    role set in the permissions.
+    """
+
+    def __init__(self, app, tenant_handler, logger):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param TenantHandler tenant_handler: Tenant handler
+        :param Logger logger: Application logger
+        """
+        self.app = app
+        self.tenant_handler = tenant_handler
+        self.logger = logger
+
+        # comma separated list of tenants to warm up
+        self.tenants = [
+            tenant.strip()
+            for tenant in os.environ.get('WARMUP_TENANTS', '').split(',')
+            if tenant.strip()
+        ]
+        # base URL for warm-up requests, with optional @tenant@ placeholder
+        self.base_url = os.environ.get('WARMUP_BASE_URL', 'http://localhost/')
+
+        # process IDs of started and finished warm-up
+        # NOTE: these are copied on fork, so they are only valid for the
+        #       matching process
+        self.started_pid = None
+        self.done_pid = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start warm-up in background thread, if not yet started in the
+        current process.
+
+        NOTE: call this lazily, e.g. on the first request, and not at import,
+              so that the thread is never started before all routes are
+              registered or in the parent process of pre-forked workers
+        """
+        if not self.tenants:
+            return
+
+        with self.lock:
+            if self.started_pid == os.getpid():
+                # already started in this process
+                return
+            self.started_pid = os.getpid()
+
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def ready(self):
+        """Return whether warm-up has finished in the current process."""
+        return not self.tenants or self.done_pid == os.getpid()
+
+    def run(self):
+        """Warm up all configured tenants."""
+        try:
+            for tenant in self.tenants:
+                try:
+                    self.warm_up_tenant(tenant)
+                except Exception as e:
+                    self.logger.error(
+                        "Could not warm up tenant '%s':\n%s" % (tenant, e)
+                    )
+        finally:
+            self.done_pid = os.getpid()
+
+    def warm_up_tenant(self, tenant):
+        """Create Map Viewer handler of tenant and precompute the filtered
+        themes for each distinct role set.
+
+        NOTE: requests are sent through the full WSGI app, so the tenant path
+              prefix and any cache keys are the same as for regular requests
+
+        :param str tenant: Tenant ID
+        """
+        client = self.app.test_client()
+        base_url = self.base_url.replace('@tenant@', tenant)
+        headers = {}
+        if self.tenant_handler.tenant_header:
+            headers[self.tenant_handler.tenant_header] = tenant
+
+        # create handler with anonymous request
+        response = client.get('/themes.json', base_url=base_url, headers=headers)
+        response.close()
+        handler = self.tenant_handler.handler('mapViewer', 'qwc', tenant)
+        if handler is None:
+            self.logger.warning(
+                "No Map Viewer handler for tenant '%s' after warm-up request" %
+                tenant
+            )
+            return
+
+        identities = handler.warmup_identities()
+        languages = handler.tenant_config.get('warmup_languages', [''])
+        with self.app.app_context():
+            tokens = [
+                create_access_token(identity) if identity else None
+                for identity in identities
+            ]
+
+        for token in tokens:
+            request_headers = dict(headers)
+            if token:
+                request_headers['Authorization'] = 'Bearer %s' % token
+            for lang in languages:
+                url = '/themes.json'
+                if lang:
+                    url += '?lang=%s' % lang
+                response = client.get(
+                    url, base_url=base_url, headers=request_headers
+                )
+                response.close()
+
+        self.logger.info(
+            "Warmed up tenant '%s' for %d role sets" % (tenant, len(tokens))
+        )
@@ -0,0 +1,41 @@
+import argparse
+import logging
+import os
+
+import pytest
+
+from viewer_benchmark import create_tenant
+
+
+@pytest.fixture(scope='session')
+def tenant_dir(tmp_path_factory):
+    """Config dir of a small synthetic tenant without Config DB."""
+    base_dir = tmp_path_factory.mktemp('tenant')
+    args = argparse.Namespace(
+        themes=3, layers=5, depth=2, roles=4, assets=0, form_fields=0,
+        thumbnail_size=0, db='none'
+    )
+    create_tenant(str(base_dir), args)
+    return os.path.join(str(base_dir), 'config')
+
+
+@pytest.fixture
+def app(tenant_dir, monkeypatch):
+    """Map Viewer application for the synthetic tenant."""
+    monkeypatch.setenv('CONFIG_PATH', tenant_dir)
+    monkeypatch.setenv(
+        'JWT_SECRET_KEY', 'test-secret-key-of-sufficient-length-for-hs256'
+    )
+
+    from server import app
+    app.logger.setLevel(logging.ERROR)
+    return app
+
+
+@pytest.fixture
+def handler(app):
+    """Map Viewer handler of the synthetic tenant."""
+    import server
+
+    with app.test_request_context('/'):
+        return server.qwc2_viewer_handler()
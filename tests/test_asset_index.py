@@ -0,0 +1,109 @@
+import json
+import logging
+import threading
+import time
+
+import pytest
+
+from qwc_services_core.tenant_handler import TenantHandler
+
+
+# number of concurrent asset lookups
+CONCURRENT_REQUESTS = 8
+# delay in seconds of each asset index build, so that all lookups overlap
+INDEX_DELAY = 0.3
+
+
+@pytest.fixture
+def viewer(tmp_path, monkeypatch):
+    tenant_path = tmp_path / 'config' / 'default'
+    tenant_path.mkdir(parents=True)
+    assets_path = tmp_path / 'qwc2' / 'assets'
+    assets_path.mkdir(parents=True)
+    (assets_path / 'old.svg').write_text('<svg/>')
+
+    config = {
+        'service': 'map-viewer',
+        'config': {
+            'qwc2_path': str(tmp_path / 'qwc2'),
+            'ogc_service_url': '/ows/',
+            'db_url': ''
+        },
+        'resources': {
+            'qwc2_config': {'config': {}},
+            'qwc2_themes': {'themes': {'items': [], 'backgroundLayers': []}}
+        }
+    }
+    (tenant_path / 'mapViewerConfig.json').write_text(json.dumps(config))
+    permissions = {'users': [], 'groups': [], 'roles': []}
+    (tenant_path / 'permissions.json').write_text(json.dumps(permissions))
+    monkeypatch.setenv('CONFIG_PATH', str(tmp_path / 'config'))
+
+    from qwc2_viewer import QWC2Viewer
+
+    logger = logging.getLogger(__name__)
+    viewer = QWC2Viewer('default', TenantHandler(logger), logger)
+
+    # count and delay asset index builds
+    viewer.index_builds = []
+    collect_asset_files = viewer.collect_asset_files
+
+    def counting_collect_asset_files():
+        viewer.index_builds.append(1)
+        time.sleep(INDEX_DELAY)
+        return collect_asset_files()
+
+    monkeypatch.setattr(
+        viewer, 'collect_asset_files', counting_collect_asset_files
+    )
+    return viewer
+
+
+def concurrent_lookups(viewer, path):
+    """Look up path in CONCURRENT_REQUESTS simultaneous threads and return
+    the results and the max duration of a lookup."""
+    barrier = threading.Barrier(CONCURRENT_REQUESTS)
+    results = []
+    durations = []
+
+    def lookup():
+        barrier.wait()
+        start = time.monotonic()
+        results.append(viewer.asset_exists(path))
+        durations.append(time.monotonic() - start)
+
+    threads = [
+        threading.Thread(target=lookup) for _ in range(CONCURRENT_REQUESTS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results, max(durations)
+
+
+def test_initial_index_built_once(viewer):
+    results, _ = concurrent_lookups(viewer, 'old.svg')
+
+    assert results == [True] * CONCURRENT_REQUESTS
+    assert len(viewer.index_builds) == 1
+
+
+def test_stale_index_served_while_refreshing(viewer, tmp_path):
+    viewer.asset_exists('old.svg')
+    (tmp_path / 'qwc2' / 'assets' / 'new.svg').write_text('<svg/>')
+    # expire asset index
+    viewer.asset_index['expires'] = time.monotonic()
+
+    results, max_duration = concurrent_lookups(viewer, 'new.svg')
+
+    # lookups do not wait for the refresh
+    assert results == [False] * CONCURRENT_REQUESTS
+    assert max_duration < INDEX_DELAY
+
+    # wait for refresh
+    with viewer.asset_index_refresh_lock:
+        pass
+    assert len(viewer.index_builds) == 2
+    assert viewer.asset_exists('new.svg')
@@ -0,0 +1,18 @@
+from metrics import metrics
+
+
+def test_themes_stages_do_not_overlap(app, handler, monkeypatch):
+    monkeypatch.setattr(metrics, 'active', True)
+    monkeypatch.setattr(metrics, 'server_timing', True)
+    handler.themes_cache.clear()
+
+    response = app.test_client().get('/themes.json')
+
+    timings = {}
+    for timing in response.headers['Server-Timing'].split(', '):
+        name, duration = timing.split(';dur=')
+        timings[name] = float(duration)
+    total = timings.pop('total')
+
+    assert set(timings) == {'permissions', 'filter_themes', 'serialize'}
+    assert sum(timings.values()) <= total
@@ -0,0 +1,121 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from qwc_services_core.tenant_handler import TenantHandler
+
+
+# read timeout in seconds for requests to the stub permalink service
+READ_TIMEOUT = 0.5
+# delay in seconds of slow responses of the stub permalink service
+SLOW_RESPONSE_DELAY = 3
+
+
+class PermalinkServiceStub(BaseHTTPRequestHandler):
+    """Stub of the internal permalink service, recording all requests."""
+
+    # keep connections alive
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        server.client_ports.add(self.client_address[1])
+
+        if 'slow' in self.path:
+            time.sleep(SLOW_RESPONSE_DELAY)
+
+        body = json.dumps({'query': {'t': 'permalink_theme'}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def permalink_service():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PermalinkServiceStub)
+    server.daemon_threads = True
+    server.block_on_close = False
+    server.requests = []
+    server.client_ports = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def viewer(tmp_path, monkeypatch, permalink_service):
+    tenant_path = tmp_path / 'config' / 'default'
+    tenant_path.mkdir(parents=True)
+    qwc2_path = tmp_path / 'qwc2'
+    qwc2_path.mkdir()
+
+    service_url = 'http://127.0.0.1:%d/' % permalink_service.server_port
+    config = {
+        'service': 'map-viewer',
+        'config': {
+            'qwc2_path': str(qwc2_path),
+            'ogc_service_url': '/ows/',
+            'db_url': '',
+            'internal_permalink_service_url': service_url,
+            'internal_permalink_service_connect_timeout': 1,
+            'internal_permalink_service_read_timeout': READ_TIMEOUT
+        },
+        'resources': {
+            'qwc2_config': {'config': {}},
+            'qwc2_themes': {'themes': {'items': [], 'backgroundLayers': []}}
+        }
+    }
+    (tenant_path / 'mapViewerConfig.json').write_text(json.dumps(config))
+    permissions = {'users': [], 'groups': [], 'roles': []}
+    (tenant_path / 'permissions.json').write_text(json.dumps(permissions))
+    monkeypatch.setenv('CONFIG_PATH', str(tmp_path / 'config'))
+
+    from qwc2_viewer import QWC2Viewer
+
+    logger = logging.getLogger(__name__)
+    return QWC2Viewer('default', TenantHandler(logger), logger)
+
+
+def theme_from_params(viewer, params):
+    return viewer._QWC2Viewer__theme_from_params(None, params)
+
+
+def test_permalink_cache(viewer, permalink_service):
+    for _ in range(3):
+        theme = theme_from_params(viewer, {'k': 'key1'})
+        assert theme == 'permalink_theme'
+
+    assert permalink_service.requests == ['/resolvepermalink?key=key1']
+    assert viewer.permalink_cache.hits == 2
+
+
+def test_pooled_session_reuses_connection(viewer, permalink_service):
+    for i in range(5):
+        theme_from_params(viewer, {'k': 'key%d' % i})
+
+    assert len(permalink_service.requests) == 5
+    assert len(permalink_service.client_ports) == 1
+
+
+def test_read_timeout(viewer, permalink_service):
+    start = time.monotonic()
+    theme = theme_from_params(viewer, {'k': 'slow', 't': 'default_theme'})
+    elapsed = time.monotonic() - start
+
+    # fall back to theme param without waiting for slow response
+    assert theme == 'default_theme'
+    assert elapsed < SLOW_RESPONSE_DELAY / 2
+    # failed lookups are not cached
+    assert viewer.permalink_cache.get('slow') is None
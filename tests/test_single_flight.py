@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+
+# number of concurrent requests per identity
+CONCURRENT_REQUESTS = 8
+# delay in seconds of each computation, so that all requests overlap
+COMPUTATION_DELAY = 0.3
+
+
+def counting(func, counts, lock):
+    """Return wrapper of func, which counts and delays its calls."""
+    def wrapper(*args, **kwargs):
+        with lock:
+            counts.append(1)
+        time.sleep(COMPUTATION_DELAY)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def concurrent_requests(app, url, usernames):
+    """Send CONCURRENT_REQUESTS simultaneous requests for each username and
+    return the response bodies by username."""
+    headers = {}
+    with app.app_context():
+        for username in usernames:
+            headers[username] = {
+                'Authorization': 'Bearer %s' % create_access_token(
+                    {'username': username}
+                )
+            }
+
+    requests = [
+        username for username in usernames
+        for _ in range(CONCURRENT_REQUESTS)
+    ]
+    barrier = threading.Barrier(len(requests))
+    bodies = {username: [] for username in usernames}
+    errors = []
+
+    def request(username):
+        client = app.test_client()
+        barrier.wait()
+        response = client.get(url, headers=headers[username])
+        if response.status_code != 200:
+            errors.append(response.status_code)
+        bodies[username].append(response.get_data())
+
+    threads = [
+        threading.Thread(target=request, args=(username,))
+        for username in requests
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    return bodies
+
+
+@pytest.mark.parametrize('url, method', [
+    ('/themes.json', 'filter_themes'),
+    ('/config.json', 'build_config')
+])
+def test_one_computation_per_key(app, handler, monkeypatch, url, method):
+    counts = []
+    monkeypatch.setattr(
+        handler, method,
+        counting(getattr(handler, method), counts, threading.Lock())
+    )
+    handler.themes_cache.clear()
+
+    # users with different role sets
+    usernames = ['user_0', 'user_2']
+    bodies = concurrent_requests(app, url, usernames)
+
+    assert len(counts) == len(usernames)
+    for username in usernames:
+        assert len(bodies[username]) == CONCURRENT_REQUESTS
+        assert len(set(bodies[username])) == 1
+
+
+def test_themes_cache_rechecked_in_flight(app, handler, monkeypatch):
+    counts = []
+    monkeypatch.setattr(
+        handler, 'filter_themes',
+        counting(handler.filter_themes, counts, threading.Lock())
+    )
+    handler.themes_cache.clear()
+
+    with app.test_request_context('/'):
+        cached = handler.permitted_themes_entry(None, None)
+        cache_key = next(iter(handler.themes_cache.entries))
+
+        # computation started after a previous one with the same key
+        entry = handler.build_permitted_themes_entry(None, None, cache_key)
+
+    assert entry is cached
+    assert len(counts) == 1
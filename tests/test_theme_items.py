@@ -0,0 +1,89 @@
+import json
+import logging
+
+import pytest
+
+from qwc_services_core.tenant_handler import TenantHandler
+from synthetic_themes import build_theme_item, collect_layer_names
+
+
+@pytest.fixture
+def duplicate_theme_items():
+    # theme items with same ID, but different WMS and layer trees
+    items = [
+        build_theme_item(0, num_layers=3, depth=1),
+        build_theme_item(1, num_layers=5, depth=2)
+    ]
+    for item in items:
+        item['id'] = 'duplicate'
+    return items
+
+
+@pytest.fixture
+def viewer(app, tmp_path, monkeypatch, duplicate_theme_items):
+    tenant_path = tmp_path / 'config' / 'default'
+    tenant_path.mkdir(parents=True)
+    qwc2_path = tmp_path / 'qwc2'
+    qwc2_path.mkdir()
+
+    config = {
+        'service': 'map-viewer',
+        'config': {
+            'qwc2_path': str(qwc2_path),
+            'ogc_service_url': '/ows/',
+            'db_url': ''
+        },
+        'resources': {
+            'qwc2_config': {'config': {}},
+            'qwc2_themes': {'themes': {
+                'items': duplicate_theme_items, 'subdirs': [],
+                'backgroundLayers': []
+            }}
+        }
+    }
+    (tenant_path / 'mapViewerConfig.json').write_text(json.dumps(config))
+    permissions = {
+        'users': [], 'groups': [],
+        'roles': [{
+            'role': 'public',
+            'permissions': {
+                'wms_services': [
+                    {
+                        'name': item['wms_name'],
+                        'layers': [
+                            {'name': name} for name in collect_layer_names(
+                                item['sublayers'], [item['wms_name']]
+                            )
+                        ]
+                    }
+                    for item in duplicate_theme_items
+                ]
+            }
+        }]
+    }
+    (tenant_path / 'permissions.json').write_text(json.dumps(permissions))
+    monkeypatch.setenv('CONFIG_PATH', str(tmp_path / 'config'))
+
+    from qwc2_viewer import QWC2Viewer
+
+    logger = logging.getLogger(__name__)
+    return QWC2Viewer('default', TenantHandler(logger), logger)
+
+
+def test_duplicate_theme_ids_warning(viewer, caplog):
+    # resources are loaded on setup of viewer fixture
+    messages = [record.getMessage() for record in caplog.get_records('setup')]
+    assert "Duplicate theme ID 'duplicate' in 2 theme items" in messages
+
+
+def test_duplicate_theme_ids_layer_trees(app, viewer, duplicate_theme_items):
+    with app.test_request_context('/'):
+        permission_context = viewer.permission_context(None)
+        items = viewer.filter_themes(permission_context, 'en', [])['items']
+
+    assert len(items) == 2
+    for item, source_item in zip(items, duplicate_theme_items):
+        # layer tree filtered by layer index of its own source theme item
+        assert item['wms_name'] == source_item['wms_name']
+        assert collect_layer_names(item['sublayers'], []) == \
+            collect_layer_names(source_item['sublayers'], [])
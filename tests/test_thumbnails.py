@@ -0,0 +1,62 @@
+import json
+import logging
+
+import pytest
+
+from qwc_services_core.tenant_handler import TenantHandler
+
+
+pytest.importorskip('PIL')
+
+THUMBNAIL_BASE64 = 'iVBORw0KGgo='
+
+
+def create_viewer(tmp_path, monkeypatch, tenant, config):
+    tenant_path = tmp_path / 'config' / tenant
+    tenant_path.mkdir(parents=True)
+    qwc2_path = tmp_path / 'qwc2'
+    qwc2_path.mkdir(exist_ok=True)
+
+    config = {
+        'service': 'map-viewer',
+        'config': dict({
+            'qwc2_path': str(qwc2_path),
+            'ogc_service_url': '/ows/',
+            'db_url': '',
+            'thumbnail_cache_dir': str(tmp_path / 'thumbnails'),
+            'thumbnail_transcoding': True
+        }, **config),
+        'resources': {
+            'qwc2_config': {'config': {}},
+            'qwc2_themes': {'themes': {'items': [], 'backgroundLayers': []}}
+        }
+    }
+    (tenant_path / 'mapViewerConfig.json').write_text(json.dumps(config))
+    permissions = {'users': [], 'groups': [], 'roles': []}
+    (tenant_path / 'permissions.json').write_text(json.dumps(permissions))
+    monkeypatch.setenv('CONFIG_PATH', str(tmp_path / 'config'))
+
+    from qwc2_viewer import QWC2Viewer
+
+    logger = logging.getLogger(__name__)
+    return QWC2Viewer(tenant, TenantHandler(logger), logger)
+
+
+@pytest.mark.parametrize('config', [
+    {'thumbnail_size': [200, 100]},
+    {'thumbnail_quality': 50},
+    {'thumbnail_formats': ['png']}
+])
+def test_thumbnail_url_changes_with_transcoding_settings(
+        tmp_path, monkeypatch, config):
+    default_viewer = create_viewer(tmp_path, monkeypatch, 'default', {})
+    viewer = create_viewer(tmp_path, monkeypatch, 'other', config)
+
+    default_path = default_viewer.extract_base64_thumbnail_image(THUMBNAIL_BASE64)
+    path = viewer.extract_base64_thumbnail_image(THUMBNAIL_BASE64)
+
+    assert path != default_path
+    # URL is stable for the same image and settings
+    assert default_path == create_viewer(
+        tmp_path, monkeypatch, 'same', {}
+    ).extract_base64_thumbnail_image(THUMBNAIL_BASE64)
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+
+BENCHMARK_PATH = os.path.join(
+    os.path.dirname(__file__), '..', 'benchmarks', 'viewer_benchmark.py'
+)
+
+
+def test_benchmark_smoke(tmp_path):
+    output_path = tmp_path / 'results.json'
+    subprocess.run([
+        sys.executable, BENCHMARK_PATH,
+        '--themes', '2', '--layers', '3', '--depth', '2', '--roles', '2',
+        '--assets', '2', '--form-fields', '2', '--thumbnail-size', '100',
+        '--db', 'none', '--repeat', '1', '--output', str(output_path)
+    ], check=True, capture_output=True, timeout=60)
+
+    results = json.loads(output_path.read_text())['results']
+    assert 'permitted_themes (cold)' in results
+    for stats in results.values():
+        assert stats['median_ms'] >= 0
+
+
+def test_fixed_permissions_reader(handler):
+    from viewer_benchmark import FixedPermissionsReader
+
+    permissions_reader = handler.permissions_handler
+    fixed_reader = FixedPermissionsReader(permissions_reader)
+    identity = {'username': 'user_1'}
+
+    for _ in range(2):
+        assert fixed_reader.identity_roles(identity) == \
+            permissions_reader.identity_roles(identity)
+        assert fixed_reader.resource_permissions('wms_services', identity) == \
+            permissions_reader.resource_permissions('wms_services', identity)
+        assert fixed_reader.resource_restrictions(
+            'wms_services', identity, [('theme_0', 'layers')]
+        ) == permissions_reader.resource_restrictions(
+            'wms_services', identity, [('theme_0', 'layers')]
+        )
+
+    # permissions are resolved once per lookup
+    assert len(fixed_reader.lookups) == 3